@@ -0,0 +1,316 @@
+# src/mitigator/bench.py
+"""
+Offline benchmark: local stand-ins for Places Text Search/Details, Yelp
+businesses/search and a farm of synthetic company websites, driven through the
+real collectors, store, scorer, exporter and email extractor.
+
+    python -m mitigator.bench --queries 20 --sites 200 --out bench.json
+    python -m mitigator.bench --baseline bench.json   # exit 1 on a throughput regression
+"""
+import argparse, json, os, random, re, shutil, tempfile, threading, time, zlib
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Sequence
+from urllib.parse import parse_qs, urlsplit
+from mitigator import metrics, net
+from mitigator.collect import google_collect, yelp_collect
+from mitigator.collect.details_cache import DetailsCache
+from mitigator.email_extract import extract_emails
+from mitigator.net import DomainThrottle, pooled_session
+from mitigator.page_cache import PageCache
+from mitigator.score import compute_scores
+from mitigator.store import db_init, export_csv, upsert_company, upsert_companies
+
+API_KEY = "bench-key"
+PAGE_SIZE = 20       # Text Search results per page
+MAX_PAGES = 3        # Text Search stops after 60 results
+YELP_LIMIT = 50
+# websites are http://mitigator-bench-<N>.test (distinct registrable domains, like real companies,
+# under a reserved TLD that never resolves), reached through the stand-in acting as an HTTP proxy
+SITE_RE = re.compile(r"mitigator-bench-(\d+)\.test")
+
+LAST = ["Smith", "Nguyen", "Garcia", "Olsen", "Patel", "Kim", "Murphy", "Larsen", "Chen", "Rivera", "Berg", "Novak"]
+ADJ = ["Rapid", "Premier", "Elite", "Allied", "Pacific", "Summit", "Evergreen", "Cascade", "Reliable", "First"]
+NOUN = ["Restoration", "Water Damage", "Recovery", "Cleanup", "Mitigation", "Remediation", "Response", "Services"]
+SUFFIX = ["", " LLC", " Inc", " Co"]
+CITIES = [("Seattle", "WA", 47.61, -122.33), ("Tacoma", "WA", 47.25, -122.44), ("Bellevue", "WA", 47.61, -122.20),
+          ("Everett", "WA", 47.98, -122.20), ("Renton", "WA", 47.48, -122.21)]
+
+def place(k: int) -> Dict[str, Any]:
+    """Deterministic synthetic business number k."""
+    rng = random.Random(k)
+    city, state, lat, lng = CITIES[(k + k // 960) % len(CITIES)]  # names repeat every 960; shift the city when they do
+    return {
+        "k": k, "place_id": f"P{k:07d}", "yelp_id": f"y-{k:07d}",
+        "name": f"{LAST[k % len(LAST)]} {ADJ[k // len(LAST) % len(ADJ)]} {NOUN[k // 120 % len(NOUN)]}{rng.choice(SUFFIX)}",
+        "street": f"{100 + k % 9000} {rng.choice(['Main', 'Pine', 'Oak', 'Cedar'])} St",
+        "city": city, "state": state,
+        "lat": lat + rng.uniform(-0.1, 0.1), "lng": lng + rng.uniform(-0.1, 0.1),
+        "phone": f"206{5550000 + k:07d}"[-10:],
+        "website": f"http://mitigator-bench-{k}.test",
+        "rating": round(rng.uniform(2.5, 5.0), 1), "reviews": rng.randint(0, 900),
+    }
+
+def query_places(query: str, n: int, pool: int) -> List[int]:
+    """The (stable) places a query matches; queries overlap so caches and dedupe get exercised."""
+    return random.Random(zlib.crc32(query.encode())).sample(range(pool), min(n, pool))
+
+def site_page(k: int, path: str, page_kb: int):
+    """(status, html) for a page of synthetic site k: email on /contact, /about or a root mailto, or none."""
+    filler = "<p>" + "We dry, clean and rebuild after floods and fires. " * (page_kb * 20) + "</p>"
+    kind = k % 7
+    if path in ("", "/"):
+        body = f'<a href="mailto:office@mitigator-bench-{k}.test">Email us</a>' if kind == 1 else ""
+        return 200, f"<html><body><h1>Site {k}</h1>{filler}{body}</body></html>"
+    if path == "/contact":
+        if kind in (0, 1, 2):
+            return 404, "not found"
+        return 200, f"<html><body>{filler}Reach us at info@mitigator-bench-{k}.test</body></html>"
+    if path == "/about":
+        return 200, f"<html><body>{filler}{f'owner@mitigator-bench-{k}.test' if kind == 0 else ''}</body></html>"
+    return 404, "not found"
+
+class StandIn(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, pool: int, per_query: int, token_delay: float, latency: float, page_kb: int):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.pool, self.per_query, self.token_delay = pool, per_query, token_delay
+        self.latency, self.page_kb = latency, page_kb
+        self.tokens: Dict[str, tuple] = {}  # token -> (query, page, issued_at)
+        self.lock = threading.Lock()
+        self.stats: Dict[str, int] = {}
+
+    @property
+    def base(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def handle_error(self, request, client_address):
+        pass  # clients dropping keep-alive connections (e.g. after an unread 404) are expected
+
+    def count(self, name: str):
+        with self.lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: str, ctype: str = "application/json", headers: Dict[str, str] = {}):
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        srv: StandIn = self.server
+        if srv.latency:
+            time.sleep(srv.latency)
+        u = urlsplit(self.path)  # proxied requests carry an absolute URL
+        host = (u.hostname or self.headers.get("Host", "")).split(":")[0]
+        q = {k: v[0] for k, v in parse_qs(u.query).items()}
+        site = SITE_RE.fullmatch(host)
+        if site:
+            srv.count("site_pages")
+            k = int(site.group(1))
+            status, html = site_page(k, u.path, srv.page_kb)
+            # two sites in three send an ETag (and honour If-None-Match); the rest only allow hash reuse
+            etag = f'"{zlib.crc32(html.encode()):x}"'
+            if status == 200 and k % 3 and self.headers.get("If-None-Match") == etag:
+                srv.count("site_not_modified")
+                return self._send(304, "", "text/html; charset=utf-8", {"ETag": etag})
+            return self._send(status, html, "text/html; charset=utf-8", {"ETag": etag} if status == 200 and k % 3 else {})
+        if u.path == "/maps/api/place/textsearch/json":
+            return self._send(200, json.dumps(self.textsearch(srv, q)))
+        if u.path == "/maps/api/place/details/json":
+            srv.count("google_details")
+            p = place(int(q.get("place_id", "P0")[1:]))
+            result = {"formatted_phone_number": f"({p['phone'][:3]}) {p['phone'][3:6]}-{p['phone'][6:]}",
+                      "website": p["website"]}
+            return self._send(200, json.dumps({"status": "OK", "result": result}))
+        if u.path == "/v3/businesses/search":
+            srv.count("yelp_search")
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                return self._send(401, json.dumps({"error": {"code": "UNAUTHORIZED"}}))
+            ks = query_places(f"yelp|{q.get('term')}|{q.get('location')}", min(int(q.get("limit", YELP_LIMIT)), YELP_LIMIT), srv.pool)
+            return self._send(200, json.dumps({"total": len(ks), "businesses": [yelp_business(place(k)) for k in ks]}))
+        self._send(404, json.dumps({"error": "unknown endpoint"}))
+
+    def textsearch(self, srv: StandIn, q: Dict[str, str]) -> dict:
+        srv.count("google_textsearch")
+        if q.get("key") != API_KEY:
+            return {"status": "REQUEST_DENIED", "results": []}
+        if "pagetoken" in q:
+            with srv.lock:
+                query, page, issued = srv.tokens.get(q["pagetoken"], (None, 0, 0.0))
+            if query is None or time.monotonic() - issued < srv.token_delay:
+                srv.count("google_invalid_token")  # Google rejects a token used before it is live
+                return {"status": "INVALID_REQUEST", "results": []}
+        else:
+            query, page = q.get("query", ""), 0
+        ks = query_places(query, min(srv.per_query, PAGE_SIZE * MAX_PAGES), srv.pool)
+        out = {"status": "OK", "results": [google_result(place(k)) for k in ks[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]]}
+        if (page + 1) * PAGE_SIZE < len(ks):
+            token = f"T{zlib.crc32(query.encode()):x}-{page + 1}-{random.getrandbits(32):x}"
+            with srv.lock:
+                srv.tokens[token] = (query, page + 1, time.monotonic())
+            out["next_page_token"] = token
+        return out
+
+def google_result(p: Dict[str, Any]) -> dict:
+    return {"place_id": p["place_id"], "name": p["name"],
+            "formatted_address": f"{p['street']}, {p['city']}, {p['state']} 98101, United States",
+            "geometry": {"location": {"lat": p["lat"], "lng": p["lng"]}},
+            "types": ["general_contractor", "point_of_interest"],
+            "rating": p["rating"], "user_ratings_total": p["reviews"]}
+
+def yelp_business(p: Dict[str, Any]) -> dict:
+    return {"id": p["yelp_id"], "name": p["name"], "phone": f"+1{p['phone']}",
+            "url": f"https://www.yelp.com/biz/{p['yelp_id']}",
+            "location": {"address1": p["street"], "city": p["city"], "state": p["state"]},
+            "coordinates": {"latitude": p["lat"], "longitude": p["lng"]},
+            "categories": [{"title": "Damage Restoration"}],
+            "rating": p["rating"], "review_count": p["reviews"]}
+
+def _pct(sorted_s: Sequence[float], q: float) -> float:
+    return sorted_s[min(len(sorted_s) - 1, int(q * len(sorted_s)))] if sorted_s else 0.0
+
+def timed(name: str, fn: Callable[[Any], Any], items: Sequence[Any], workers: int = 1,
+          count: Callable[[Any, Any], int] = lambda item, out: 1) -> tuple:
+    """Run fn over items (in a pool when workers > 1); returns (result dict, outputs)."""
+    lat: List[float] = []
+    def one(item):
+        t = time.perf_counter()
+        out = fn(item)
+        lat.append(time.perf_counter() - t)
+        return out
+    t0 = time.perf_counter()
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outs = list(pool.map(one, items))
+    else:
+        outs = [one(i) for i in items]
+    wall = time.perf_counter() - t0
+    n = sum(count(i, o) for i, o in zip(items, outs))
+    lat.sort()
+    res = {"name": name, "items": n, "calls": len(items), "seconds": round(wall, 4),
+           "per_s": round(n / wall, 1) if wall else None,
+           "p50_ms": round(_pct(lat, 0.50) * 1e3, 2), "p95_ms": round(_pct(lat, 0.95) * 1e3, 2),
+           "p99_ms": round(_pct(lat, 0.99) * 1e3, 2), "max_ms": round((lat[-1] if lat else 0) * 1e3, 2)}
+    return res, outs
+
+def run(args) -> Dict[str, Any]:
+    srv = StandIn(args.places, args.per_query, args.token_delay, args.latency_ms / 1e3, args.page_kb)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    google_collect.GOOGLE_API_BASE = yelp_collect.YELP_API_BASE = srv.base
+    # API calls go straight to the stand-in whatever proxy the environment sets (requests reads no_proxy per call)
+    no_proxy = os.environ.get("no_proxy") or os.environ.get("NO_PROXY")
+    os.environ["no_proxy"] = os.environ["NO_PROXY"] = ",".join(filter(None, (no_proxy, "127.0.0.1")))
+    google_collect.PAGE_TOKEN_DELAY_S = args.token_delay
+    for provider in ("google", "yelp"):
+        net.configure(provider, args.qps, args.workers)
+    metrics.METRICS.reset()
+
+    work = tempfile.mkdtemp(prefix="mitigator-bench-")
+    queries = [(f"restoration {i}", CITIES[i % len(CITIES)][0] + ", WA") for i in range(args.queries)]
+    results = []
+    try:
+        db = os.path.join(work, "bench.db"); db_init(db)
+        cache = DetailsCache(db)
+        r, outs = timed("google_text_search", lambda q: google_collect.google_text_search(API_KEY, *q, cache=cache),
+                        queries, args.workers, lambda q, rows: len(rows))
+        cache.close()
+        results.append(r); google_rows = [row for rows in outs for row in rows]
+        r, outs = timed("yelp_text_search", lambda q: yelp_collect.yelp_text_search(API_KEY, *q),
+                        queries, args.workers, lambda q, rows: len(rows))
+        results.append(r); yelp_rows = [row for rows in outs for row in rows]
+        rows = google_rows + yelp_rows
+
+        r, _ = timed("upsert_company", lambda row: upsert_company(db, dict(row)), rows[:args.single_upserts])
+        results.append(r)
+        r, _ = timed("upsert_companies", lambda batch: upsert_companies(db, [dict(x) for x in batch]),
+                     [google_rows, yelp_rows], count=lambda b, out: len(b))
+        results.append(r)
+        r, _ = timed("compute_scores", compute_scores, [[dict(x) for x in rows]], count=lambda b, out: len(b))
+        results.append(r)
+        r, _ = timed("export_csv", lambda out: export_csv(db, out), [os.path.join(work, "bench.csv")],
+                     count=lambda out, n: n)
+        results.append(r)
+
+        sites = sorted({row["website"] for row in google_rows if row.get("website")})[:args.sites]
+        session = pooled_session(args.workers)
+        session.trust_env = False  # else an HTTP_PROXY in the environment overrides session.proxies
+        session.proxies = {"http": srv.base}  # every site host resolves to the stand-in
+        throttle = DomainThrottle(0.0)
+        r, outs = timed("extract_emails", lambda site: extract_emails(site, 5, 0.0, session, throttle),
+                        sites, args.workers)
+        r["sites_with_email"] = sum(1 for o in outs if o)
+        results.append(r)
+        # cold then warm page cache: the warm pass is conditional GETs, hash reuse and skipped 404s
+        pages = PageCache(db)
+        for name in ("extract_emails_cold", "extract_emails_warm"):
+            r, outs = timed(name, lambda site: extract_emails(site, 5, 0.0, session, throttle, pages),
+                            sites, args.workers)
+            r["sites_with_email"] = sum(1 for o in outs if o)
+            results.append(r)
+            pages.flush()
+        pages.close()
+    finally:
+        srv.shutdown(); srv.server_close()
+        shutil.rmtree(work, ignore_errors=True)
+    return {"results": results, "stand_in_requests": srv.stats, "metrics": metrics.METRICS.snapshot(),
+            "params": vars(args)}
+
+def regressions(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    base = {r["name"]: r for r in baseline.get("results", [])}
+    out = []
+    for r in report["results"]:
+        b = base.get(r["name"])
+        if b and b.get("per_s") and r["per_s"] is not None and r["per_s"] < b["per_s"] * (1 - tolerance):
+            out.append(f"{r['name']}: {r['per_s']}/s vs baseline {b['per_s']}/s")
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="mitigator.bench", description="offline benchmark against local API stand-ins")
+    ap.add_argument("--queries", type=int, default=20, help="Text Search / Yelp queries to run")
+    ap.add_argument("--per-query", type=int, default=60, help="Text Search results per query (max 60)")
+    ap.add_argument("--places", type=int, default=2000, help="synthetic businesses the queries draw from")
+    ap.add_argument("--sites", type=int, default=200, help="websites to run extract_emails on")
+    ap.add_argument("--single-upserts", type=int, default=200, help="rows to time through upsert_company one by one")
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--qps", type=float, default=0.0, help="per-provider limiter QPS (0 = unpaced)")
+    ap.add_argument("--token-delay", type=float, default=0.05, help="seconds before a next_page_token goes live")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="added stand-in latency per request")
+    ap.add_argument("--page-kb", type=int, default=8, help="approximate size of each site page")
+    ap.add_argument("--out", help="write the JSON report here")
+    ap.add_argument("--baseline", help="earlier --out report to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed throughput drop vs baseline")
+    args = ap.parse_args(argv)
+
+    report = run(args)
+    print(f"{'benchmark':<20}{'items':>8}{'sec':>9}{'items/s':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for r in report["results"]:
+        print(f"{r['name']:<20}{r['items']:>8}{r['seconds']:>9.3f}{r['per_s'] or 0:>11.1f}"
+              f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['max_ms']:>9.2f}")
+    print(f"stand-in requests: {report['stand_in_requests']}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            bad = regressions(report, json.load(f), args.tolerance)
+        for line in bad:
+            print(f"REGRESSION {line}")
+        if bad:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
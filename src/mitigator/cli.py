@@ -1,35 +1,225 @@
-from mitigator.config import GOOGLE_KEY, YELP_KEY, DB_PATH, CSV_OUT, KEYWORDS, SERVICE_AREAS
-from mitigator.collect.google_collect import google_text_search
+import argparse, os, subprocess, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import List, Optional, Tuple
+from mitigator.config import GOOGLE_KEY, YELP_KEY, DB_PATH, CSV_OUT, KEYWORDS, SERVICE_AREAS, CRAWL_WORKERS, CRAWL_RETRIES, HTTP_BACKOFF_S, PROVIDER_LIMITS, PIPELINE_QUEUE, PIPELINE_BATCH, DETAILS_CACHE_DB, FUZZY_DEDUPE, EXPORT_INCREMENTAL, METRICS_DIR
+from mitigator import metrics
+from mitigator.collect.details_cache import DetailsCache
+from mitigator.collect.google_collect import PageTokenExpired, google_text_search_pages
 from mitigator.collect.yelp_collect import yelp_text_search
-from mitigator.score import compute_scores
-from mitigator.store import db_init, upsert_company, export_csv
+from mitigator.fuzzy import recluster
+from mitigator.journal import CrawlJournal, Unit
+from mitigator.pipeline import Event, Outbox, batched, collect, normalize
+from mitigator.query import search
+from mitigator.refresh import due_queries, plan, refresh_details
+from mitigator.score import rescore_db
+from mitigator.shard import find_shards, merge_shards, parse_shard, shard_db_path, shard_units
+from mitigator.export import FORMATS, export
+from mitigator.store import db_init, upsert_companies
 
-def main():
-    if not (GOOGLE_KEY or YELP_KEY):
-        raise SystemExit("Missing GOOGLE_PLACES_KEY or YELP_FUSION_KEY in .env")
-
-    db_init(DB_PATH)
-    all_rows = []
+def crawl_jobs():
     for loc in SERVICE_AREAS:
         for kw in KEYWORDS:
             if GOOGLE_KEY not in (None,""):
-                for r in google_text_search(GOOGLE_KEY, kw, loc):
-                    upsert_company(DB_PATH, r); all_rows.append(r)
+                yield ("google", kw, loc)
             if YELP_KEY not in (None,""):
-                for r in yelp_text_search(YELP_KEY, kw, loc):
-                    upsert_company(DB_PATH, r); all_rows.append(r)
+                yield ("yelp", kw, loc)
+
+def run_unit(out: Outbox, unit: Unit, token: Optional[str] = None, start: int = 0,
+             cache: Optional[DetailsCache] = None):
+    """
+    Collect one (provider, keyword, area) query page by page onto out; errors are
+    reported, not raised. Returns early once the pipeline's consumer has stopped.
+    """
+    provider, kw, loc = unit
+    page = start
+    try:
+        if provider == "google":
+            try:
+                pages = google_text_search_pages(GOOGLE_KEY, kw, loc, cache=cache, page_token=token, start_page=start)
+                for page, rows, nxt in pages:
+                    if not out.put(("page", unit, page, rows, nxt)):
+                        return
+                    page += 1
+            except PageTokenExpired:
+                if token is None:
+                    raise
+                page = 0  # saved token is too old to resume from; redo the query
+                for page, rows, nxt in google_text_search_pages(GOOGLE_KEY, kw, loc, cache=cache):
+                    if not out.put(("page", unit, page, rows, nxt)):
+                        return
+                    page += 1
+        else:
+            out.put(("page", unit, 0, yelp_text_search(YELP_KEY, kw, loc), None))
+    except Exception as e:
+        out.put(("failed", unit, page, None, f"{type(e).__name__}: {e}"))
+    finally:
+        out.put(("end", unit, None, None, None))
+
+def store_batch(db_path: str, batch: List[Event], journal: CrawlJournal):
+    """Upsert a batch's pages in one transaction that also journals each of them."""
+    pages = [ev for ev in batch if ev[0] == "page"]
+    for kind, unit, page, _, error in batch:
+        if kind == "failed":
+            journal.fail(unit, page, error)
+            metrics.inc("crawl_pages_total", provider=unit[0], result="failed")
+    if not pages:
+        return
+    def record(cur):
+        for _, unit, page, rows, nxt in pages:
+            journal.record(cur, unit, page, rows, nxt)
+            metrics.inc("crawl_pages_total", provider=unit[0], result="done")
+    rows = [r for ev in pages for r in ev[3]]
+    metrics.inc("rows_collected_total", len(rows))
+    upsert_companies(db_path, rows, in_tx=record)
+
+def finalize(db_path: str):
+    """The whole-table passes after collecting: fuzzy dedupe, scoring, export."""
+    if FUZZY_DEDUPE:
+        recluster(db_path)
+
+    rescore_db(db_path)
+
+    export(db_path, CSV_OUT, incremental=EXPORT_INCREMENTAL)
+
+def crawl(fresh: bool = False, full: bool = False, shard: Optional[Tuple[int, int]] = None):
+    """
+    Collect into DB_PATH and finalize it; with shard=(i, n), collect only that shard's
+    queries into its own shard DB and leave dedupe/scoring/export to `merge`.
+    """
+    if not (GOOGLE_KEY or YELP_KEY):
+        raise SystemExit("Missing GOOGLE_PLACES_KEY or YELP_FUSION_KEY in .env")
+
+    db = shard_db_path(DB_PATH, *shard) if shard else DB_PATH
+    db_init(db)
+    journal = CrawlJournal(db, fresh=fresh)
+    # a cache kept in the main DB is kept in the shard DB instead (merge carries it over)
+    cache = DetailsCache(db if shard and DETAILS_CACHE_DB == DB_PATH else DETAILS_CACHE_DB)
+    units = list(crawl_jobs())
+    if shard:
+        units = shard_units(units, *shard)
+        print(f"Shard {shard[0]}/{shard[1]}: {len(units)} queries into {db}")
+    if not full:  # only queries whose ratings are stale (see mitigator.refresh)
+        planned = due_queries(journal, units)
+        print(f"Refreshing {len(planned)}/{len(units)} queries.")
+        units = planned
+    if journal.resumed:
+        print(f"Resuming crawl run {journal.run_id}: {len(units) - len(journal.pending(units))}/{len(units)} queries already done.")
+    status = "failed"
+    try:
+        # Queries run in parallel (each provider paced by its own limiter in mitigator.net);
+        # pages stream through mitigator.pipeline and are stored and journaled on this
+        # thread, so sqlite only ever sees one writer and memory stays bounded.
+        with metrics.stage("collect"), ThreadPoolExecutor(max_workers=CRAWL_WORKERS) as pool:
+            for attempt in range(CRAWL_RETRIES + 1):
+                todo = journal.pending(units)
+                if not todo:
+                    break
+                if attempt:
+                    print(f"Retrying {len(todo)} failed queries (pass {attempt}/{CRAWL_RETRIES})...")
+                    time.sleep(HTTP_BACKOFF_S * 2 ** attempt)
+                # closing(): if storing fails (or ^C), the collectors are told to stop before the pool joins them
+                with closing(collect(pool, [(u, t, s, cache) for u, t, s in todo], run_unit, PIPELINE_QUEUE)) as events:
+                    for batch in batched(normalize(events), PIPELINE_BATCH):
+                        store_batch(db, batch, journal)
+        if GOOGLE_KEY:
+            refresh_details(db, GOOGLE_KEY, cache)
+        cache.close()
+        failures = journal.failures()
+        journal.finish(complete=not journal.pending(units))
+        for provider, area, kw, page, error, attempts in failures:
+            print(f"FAILED {provider} {kw!r} in {area} page {page} after {attempts} attempts: {error}")
+        if not shard:
+            finalize(db)
+        status = "ok" if not failures else "partial"
+    finally:
+        saved = journal.rows_saved(); journal.close()
+        job = f"crawl_shard{shard[0]}of{shard[1]}" if shard else "crawl"
+        print(f"Run report: {metrics.report(job, status=status)}")
+    print(f"Done. Saved {saved} rows.")
+
+def shard_env(n: int) -> dict:
+    """Env for one of n local shard processes: they share this host's API quota, so each gets 1/n of every QPS."""
+    env = dict(os.environ)
+    for provider, (qps, _) in PROVIDER_LIMITS.items():
+        env[f"{provider.upper()}_QPS"] = str(qps / n)  # 0 (unpaced) stays 0
+    return env
+
+def crawl_shards(n: int, fresh: bool = False, full: bool = False):
+    """Crawl all n shards as local processes, then merge them (one host standing in for n)."""
+    flags = [f for f, on in (("--fresh", fresh), ("--full", full)) if on]
+    env = shard_env(n)
+    procs = [subprocess.Popen([sys.executable, "-m", "mitigator.cli", "crawl", "--shard", f"{i}/{n}", *flags], env=env)
+             for i in range(n)]
+    failed = [i for i, p in enumerate(procs) if p.wait() != 0]
+    if failed:
+        raise SystemExit(f"shards {failed} failed; re-run them with `crawl --shard I/{n}` (they resume), then `merge`")
+    merge([shard_db_path(DB_PATH, i, n) for i in range(n)])
+
+def merge(shards: List[str], force: bool = False):
+    shards = shards or find_shards(DB_PATH)
+    if not shards:
+        raise SystemExit(f"No shard DBs given or found next to {DB_PATH}")
+    status = "failed"
+    try:
+        t = merge_shards(DB_PATH, shards, force)
+        print(f"Merged {t['shards']} shards ({t['skipped_shards']} unchanged, skipped): {t['rows']} rows -> "
+              f"{t['inserted']} new, {t['merged']} merged, {t['collapsed']} clusters collapsed")
+        finalize(DB_PATH)
+        status = "ok"
+    finally:
+        print(f"Run report: {metrics.report('merge', status=status)}")
 
-    compute_scores(all_rows)
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="mitigator")
+    ap.add_argument("--profile", action="store_true", help=f"run under cProfile, stats to {METRICS_DIR}/<cmd>.prof")
+    sub = ap.add_subparsers(dest="cmd")
+    cp = sub.add_parser("crawl", help="collect, dedupe, score and export (default); resumes an interrupted crawl")
+    cp.add_argument("--fresh", action="store_true", help="start a new crawl even if the last one did not finish")
+    cp.add_argument("--full", action="store_true", help="re-run every query, not just the stale ones")
+    cp.add_argument("--shard", metavar="I/N", help="crawl only shard I of N (numbered from 0) into its own shard DB")
+    cp.add_argument("--shards", type=int, metavar="N", help="crawl N shards as local processes, then merge them")
+    mp = sub.add_parser("merge", help="merge shard DBs into the main DB, then dedupe, score and export")
+    mp.add_argument("shards", nargs="*", help="shard DBs (default: every shard DB next to DB_PATH)")
+    mp.add_argument("--force", action="store_true", help="re-merge shards even if unchanged since their last merge")
+    sub.add_parser("plan", help="show what the next crawl/email run would refresh")
+    sp = sub.add_parser("search", help="full-text search the companies table")
+    sp.add_argument("text")
+    sp.add_argument("--limit", type=int, default=20)
+    ep = sub.add_parser("export", help="stream companies to csv, csv.gz or parquet")
+    ep.add_argument("--out", default=CSV_OUT)
+    ep.add_argument("--format", choices=FORMATS, help="default: from --out's extension")
+    ep.add_argument("--incremental", action="store_true", help="only rows changed since the last export to --out")
+    args = ap.parse_args(argv)
+    if args.profile:
+        out = os.path.join(METRICS_DIR, f"{args.cmd or 'crawl'}.prof")
+        return metrics.profiled(lambda: run(args), out)
+    return run(args)
 
-    import sqlite3
-    con = sqlite3.connect(DB_PATH); cur = con.cursor()
-    for r in all_rows:
-        cur.execute("UPDATE companies SET score=? WHERE source=? AND source_id=?",
-                    (r["score"], r["source"], r["source_id"]))
-    con.commit(); con.close()
+def run(args):
+    if args.cmd == "search":
+        for name, score, rating, reviews, address, *_ in search(DB_PATH, args.text, args.limit):
+            print(f"{score or 0:7.3f}  {name}  ({rating or '-'}★, {reviews or 0} reviews)  {address or ''}")
+    elif args.cmd == "export":
+        n = export(DB_PATH, args.out, args.format, args.incremental)
+        print(f"Exported {n} rows to {args.out}")
+    elif args.cmd == "plan":
+        db_init(DB_PATH)
+        cache = DetailsCache(DETAILS_CACHE_DB)
+        journal = CrawlJournal(DB_PATH, start=False)
+        due = plan(DB_PATH, journal, list(crawl_jobs()), cache)
+        journal.close(); cache.close()
+        print(f"queries: {due['queries']}/{due['queries_total']}  details: {due['details']}  emails: {due['emails']}")
+    elif args.cmd == "merge":
+        merge(args.shards, args.force)
+    elif getattr(args, "shards", None):
+        crawl_shards(args.shards, args.fresh, args.full)
+    else:
+        try:
+            shard = parse_shard(args.shard) if getattr(args, "shard", None) else None
+        except ValueError as e:
+            raise SystemExit(str(e))
+        crawl(fresh=getattr(args, "fresh", False), full=getattr(args, "full", False), shard=shard)
 
-    export_csv(DB_PATH, CSV_OUT)
-    print(f"Done. Saved {len(all_rows)} rows.")
-    
 if __name__ == "__main__":
     main()
@@ -0,0 +1,128 @@
+import sqlite3, threading, time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Optional
+from mitigator import metrics
+from mitigator.config import DETAILS_CACHE_TTL_DAYS, DETAILS_CACHE_MAX
+from mitigator.db import reader, write, writer
+
+EVICT_EVERY = 500  # puts between eviction sweeps
+FLUSH_EVERY = 100  # puts buffered per write transaction
+MEM_MAX = 20000    # entries mirrored in memory (LRU); the table holds the rest
+
+class DetailsCache:
+    """
+    Place Details results keyed by place_id, shared by every query in a crawl and
+    persisted in sqlite so later crawls reuse them until they are ttl_days old.
+    Safe to use from the crawl's worker threads. Writes are buffered and handed to
+    the DB's writer thread without waiting; flush() before reading the table directly.
+    """
+    def __init__(self, db_path: str, ttl_days: float = DETAILS_CACHE_TTL_DAYS, max_entries: int = DETAILS_CACHE_MAX):
+        self.ttl_s = ttl_days * 86400
+        self.max_entries = max_entries
+        self.hits = self.misses = 0
+        self._mem: OrderedDict[str, dict] = OrderedDict()
+        self._puts = 0
+        self._buf: list[tuple] = []
+        self._last: Optional[Future] = None  # the writer runs submissions in order: waiting on this waits on all
+        self._lock = threading.Lock()
+        self.db_path = db_path
+        write(db_path, lambda con: (con.execute("""
+        CREATE TABLE IF NOT EXISTS place_details_cache (
+            place_id TEXT PRIMARY KEY,
+            phone TEXT, website TEXT,
+            fetched_at REAL            -- unix time
+        )"""), con.execute("CREATE INDEX IF NOT EXISTS idx_details_fetched ON place_details_cache(fetched_at)")))
+        self.evict()
+
+    def get(self, place_id: str) -> Optional[dict]:
+        with self._lock:
+            d = self._mem.get(place_id) or self._load(place_id)
+            if d is None:
+                self.misses += 1
+                metrics.inc("cache_requests_total", cache="place_details", result="miss")
+                return None
+            self._remember(place_id, d)
+            self.hits += 1
+            metrics.inc("cache_requests_total", cache="place_details", result="hit")
+            return d
+
+    def _remember(self, place_id: str, d: dict):
+        self._mem[place_id] = d
+        self._mem.move_to_end(place_id)
+        if len(self._mem) > MEM_MAX:
+            self._mem.popitem(last=False)
+
+    def _load(self, place_id: str) -> Optional[dict]:
+        cutoff = time.time() - self.ttl_s
+        with reader(self.db_path) as con:
+            hit = con.execute(
+                "SELECT phone, website, fetched_at FROM place_details_cache WHERE place_id = ?", (place_id,)).fetchone()
+            if hit:
+                return {"phone": hit[0], "website": hit[1]} if hit[2] >= cutoff else None
+            # Never cached (e.g. crawled before the cache existed): a recent companies
+            # row with both fields is as good as a fresh lookup, so seed the cache from it.
+            try:
+                row = con.execute("""
+                  SELECT phone, website, last_seen FROM companies
+                  WHERE source = 'google' AND source_id = ?
+                    AND phone IS NOT NULL AND phone <> '' AND website IS NOT NULL AND website <> ''
+                    AND last_seen >= ?
+                """, (place_id, time.strftime("%Y-%m-%d", time.localtime(cutoff)))).fetchone()
+            except sqlite3.OperationalError:  # no companies table in a standalone cache DB
+                return None
+        if not row:
+            return None
+        seen = time.mktime(time.strptime(row[2], "%Y-%m-%d"))
+        self._write(place_id, row[0], row[1], seen)
+        return {"phone": row[0], "website": row[1]}
+
+    def put(self, place_id: str, d: dict):
+        with self._lock:
+            self._remember(place_id, d)
+            self._write(place_id, d.get("phone"), d.get("website"), time.time())
+            self._puts += 1
+            if self._puts % EVICT_EVERY == 0:
+                self._evict()
+
+    def _write(self, place_id: str, phone, website, fetched_at: float):
+        self._buf.append((place_id, phone, website, fetched_at))
+        if len(self._buf) >= FLUSH_EVERY:
+            self._submit()
+
+    def _submit(self):
+        rows, self._buf = self._buf, []
+        self._last = writer(self.db_path).submit(
+            lambda con: con.executemany("INSERT OR REPLACE INTO place_details_cache VALUES (?,?,?,?)", rows))
+
+    def flush(self):
+        """Write buffered entries and wait until everything submitted so far is committed."""
+        with self._lock:
+            if self._buf:
+                self._submit()
+            last = self._last
+        if last is not None:
+            last.result()
+
+    def fetched_at(self) -> Dict[str, float]:
+        """When each cached place_id was last fetched (unix time), expired entries included."""
+        self.flush()
+        with reader(self.db_path) as con:
+            return dict(con.execute("SELECT place_id, fetched_at FROM place_details_cache"))
+
+    def evict(self):
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        # drop the oldest entries beyond max_entries; expired ones stay (get() ignores them)
+        # because their fetched_at is what mitigator.refresh ranks details staleness by
+        if self._buf:
+            self._submit()
+        self._last = writer(self.db_path).submit(lambda con: con.execute("""
+          DELETE FROM place_details_cache WHERE place_id IN (
+            SELECT place_id FROM place_details_cache ORDER BY fetched_at DESC LIMIT -1 OFFSET ?)
+        """, (self.max_entries,)))
+
+    def close(self):
+        self.flush()
@@ -1,42 +1,84 @@
 import time, requests
-from typing import List, Dict, Any, Optional
+from typing import Iterator, List, Optional, Tuple
+from mitigator import metrics, net
+from mitigator.config import GOOGLE_API_BASE
+from mitigator.record import Record
+from mitigator.collect.details_cache import DetailsCache
 
 DETAILS_FIELDS = "formatted_phone_number,website"
+PAGE_TOKEN_DELAY_S = 2.0
+CACHEABLE_STATUS = ("OK", "NOT_FOUND", "ZERO_RESULTS")  # Place Details answers worth keeping for the TTL
 
-def google_place_details(api_key: str, place_id: str, session: Optional[requests.Session] = None) -> dict:
-    """Return {'phone': str|None, 'website': str|None} via Place Details."""
-    s = session or requests.Session()
-    url = "https://maps.googleapis.com/maps/api/place/details/json"
+def google_place_details(api_key: str, place_id: str, session: Optional[requests.Session] = None,
+                         cache: Optional[DetailsCache] = None) -> dict:
+    """Return {'phone': str|None, 'website': str|None} via Place Details, checking cache first."""
+    if cache is not None:
+        hit = cache.get(place_id)
+        if hit is not None:
+            return hit
+    url = f"{GOOGLE_API_BASE}/maps/api/place/details/json"
     params = {"place_id": place_id, "fields": DETAILS_FIELDS, "key": api_key}
     try:
-        r = s.get(url, params=params, timeout=20)
+        with metrics.stage("details"):
+            r = net.get("google", url, session=session, params=params, timeout=20)
+        metrics.inc("api_quota_units_total", provider="google", api="details")
         r.raise_for_status()
         data = r.json() or {}
         result = data.get("result", {}) or {}
-        return {
+        d = {
             "phone": result.get("formatted_phone_number"),
             "website": result.get("website"),
         }
     except requests.RequestException:
         return {"phone": None, "website": None}
+    # only cache real answers; quota/auth errors (OVER_QUERY_LIMIT, REQUEST_DENIED, ...) come back as 200 too
+    if cache is not None and data.get("status") in CACHEABLE_STATUS:
+        cache.put(place_id, d)
+    return d
 
-def google_text_search(api_key: str, query: str, location: Optional[str]=None, enrich_details: bool=True) -> List[Dict[str,Any]]:
+class GoogleApiError(requests.RequestException):
+    """HTTP 200 with an error status in the body (OVER_QUERY_LIMIT, REQUEST_DENIED, UNKNOWN_ERROR, ...)."""
+
+class PageTokenExpired(GoogleApiError):
+    """Text Search rejected a next_page_token (used too early, or too old to resume from)."""
+
+def google_text_search(api_key: str, query: str, location: Optional[str]=None, enrich_details: bool=True,
+                       cache: Optional[DetailsCache]=None) -> List[Record]:
     """
     Use Text Search for discovery; optionally enrich each result with Place Details
-    to populate phone and website.
+    to populate phone and website. Requests are paced by the shared "google" limiter;
+    pass a crawl-wide DetailsCache to reuse details across queries and runs.
+    """
+    return [row for _, rows, _ in google_text_search_pages(api_key, query, location, enrich_details, cache)
+            for row in rows]
+
+def google_text_search_pages(api_key: str, query: str, location: Optional[str] = None, enrich_details: bool = True,
+                             cache: Optional[DetailsCache] = None, page_token: Optional[str] = None,
+                             start_page: int = 0) -> Iterator[Tuple[int, List[Record], Optional[str]]]:
+    """
+    Page-at-a-time google_text_search yielding (page, rows, next_page_token), so a crawl
+    can checkpoint each page. Pass a saved page_token/start_page to resume a query.
     """
     q = f"{query} in {location}" if location else query
-    url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-    params = {"query": q, "key": api_key}
-    out: List[Dict[str, Any]] = []
+    url = f"{GOOGLE_API_BASE}/maps/api/place/textsearch/json"
+    params = {"pagetoken": page_token, "key": api_key} if page_token else {"query": q, "key": api_key}
+    page = start_page
 
-    s = requests.Session()
+    s = net.thread_session()
     details_cache: dict[str, dict] = {}
 
     while True:
-        r = s.get(url, params=params, timeout=20); r.raise_for_status()
+        r = net.get("google", url, session=s, params=params, timeout=20); r.raise_for_status()
+        metrics.inc("api_quota_units_total", provider="google", api="textsearch")
         data = r.json() or {}
-
+        if "pagetoken" in params and data.get("status") == "INVALID_REQUEST":
+            raise PageTokenExpired(f"page token rejected for {q!r} page {page}")
+        if data.get("status") not in ("OK", "ZERO_RESULTS"):
+            # not an empty page: the query must be reported failed, or it would be journaled as done
+            raise GoogleApiError(f"Text Search {data.get('status')} for {q!r} page {page}: {data.get('error_message', '')}")
+        token = data.get("next_page_token")
+        token_at = time.monotonic()
+        out: List[Record] = []
         for p in data.get("results", []):
             place_id = p.get("place_id")
             phone, website = None, None
@@ -45,36 +87,30 @@ def google_text_search(api_key: str, query: str, location: Optional[str]=None, e
                 if place_id in details_cache:
                     d = details_cache[place_id]
                 else:
-                    d = google_place_details(api_key, place_id, session=s)
+                    d = google_place_details(api_key, place_id, session=s, cache=cache)
                     details_cache[place_id] = d
-                    time.sleep(0.05) 
                 phone, website = d.get("phone"), d.get("website")
 
-            out.append({
-                "source": "google",
-                "source_id": place_id,
-                "name": p.get("name"),
-                "phone": phone,
-                "website": website,
-                "address": p.get("formatted_address"),
-                "lat": p.get("geometry",{}).get("location",{}).get("lat"),
-                "lng": p.get("geometry",{}).get("location",{}).get("lng"),
-                "categories": ",".join(p.get("types",[]) or []),
-                "rating": p.get("rating"),
-                "review_count": p.get("user_ratings_total"),
-                "license_number": None,
-                "license_status": None,
-                "years_in_business": None,
-                "permits_24mo": None,
-                "score": None,
-                "last_seen": time.strftime("%Y-%m-%d"),
-            })
+            out.append(Record(
+                source="google",
+                source_id=place_id,
+                name=p.get("name"),
+                phone=phone,
+                website=website,
+                address=p.get("formatted_address"),
+                lat=p.get("geometry",{}).get("location",{}).get("lat"),
+                lng=p.get("geometry",{}).get("location",{}).get("lng"),
+                categories=",".join(p.get("types",[]) or []),
+                rating=p.get("rating"),
+                review_count=p.get("user_ratings_total"),
+                last_seen=time.strftime("%Y-%m-%d"),
+            ))
 
-        token = data.get("next_page_token")
+        yield page, out, token
         if not token:
             break
-        # Text Search next_page_token needs a short delay before reuse
-        time.sleep(2)
+        # Text Search next_page_token needs a short delay before reuse; the details
+        # calls above already ate into it, so only wait out the remainder.
+        time.sleep(max(0.0, PAGE_TOKEN_DELAY_S - (time.monotonic() - token_at)))
         params = {"pagetoken": token, "key": api_key}
-
-    return out
+        page += 1
@@ -7,6 +7,59 @@ YELP_KEY   = os.getenv("YELP_FUSION_KEY", "")
 DB_PATH    = os.getenv("DB_PATH", "src/data/mitigation.db")
 CSV_OUT    = os.getenv("CSV_OUT", "src/data/companies.csv")
 
+# API endpoints (overridable so the benchmark stand-ins in mitigator.bench can serve them)
+GOOGLE_API_BASE = os.getenv("GOOGLE_API_BASE", "https://maps.googleapis.com")
+YELP_API_BASE   = os.getenv("YELP_API_BASE", "https://api.yelp.com")
+
+# Crawl concurrency + per-provider limits (qps, max in-flight requests)
+CRAWL_WORKERS    = int(os.getenv("CRAWL_WORKERS", "8"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "4"))
+HTTP_BACKOFF_S   = float(os.getenv("HTTP_BACKOFF_S", "0.5"))
+CRAWL_RETRIES    = int(os.getenv("CRAWL_RETRIES", "2"))  # extra passes over failed queries before giving up
+PIPELINE_QUEUE   = int(os.getenv("PIPELINE_QUEUE", "32"))   # pages buffered between collectors and the writer
+PIPELINE_BATCH   = int(os.getenv("PIPELINE_BATCH", "500"))  # rows per store transaction
+PROVIDER_LIMITS = {
+    "google": (float(os.getenv("GOOGLE_QPS", "10")), int(os.getenv("GOOGLE_CONCURRENCY", "4"))),
+    "yelp":   (float(os.getenv("YELP_QPS", "5")),    int(os.getenv("YELP_CONCURRENCY", "2"))),
+}
+
+# SQLite tuning (mitigator.db): WAL journaling, page cache and mmap per connection, pooled readers
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_MB    = int(os.getenv("SQLITE_CACHE_MB", "64"))
+SQLITE_MMAP_MB     = int(os.getenv("SQLITE_MMAP_MB", "256"))
+SQLITE_BUSY_MS     = int(os.getenv("SQLITE_BUSY_MS", "30000"))
+SQLITE_POOL_SIZE   = int(os.getenv("SQLITE_POOL_SIZE", "4"))    # idle read connections kept per DB
+SQLITE_STMT_CACHE  = int(os.getenv("SQLITE_STMT_CACHE", "256"))  # prepared statements cached per connection
+
+# Place Details cache (shared across the crawl, persisted in sqlite)
+DETAILS_CACHE_DB       = os.getenv("DETAILS_CACHE_DB", DB_PATH)
+DETAILS_CACHE_TTL_DAYS = float(os.getenv("DETAILS_CACHE_TTL_DAYS", "30"))
+DETAILS_CACHE_MAX      = int(os.getenv("DETAILS_CACHE_MAX", "100000"))
+
+# Email scanner page cache (conditional GETs) and how long a 404 candidate path is skipped
+PAGE_CACHE_DB         = os.getenv("PAGE_CACHE_DB", DB_PATH)
+PAGE_MISSING_TTL_DAYS = float(os.getenv("PAGE_MISSING_TTL_DAYS", "90"))
+
+# Refresh planner: each run only re-fetches what is older than its TTL, stalest first, up to a budget (0 = no cap)
+REFRESH_RATINGS_TTL_DAYS = float(os.getenv("REFRESH_RATINGS_TTL_DAYS", "7"))   # re-run a query (ratings/reviews)
+REFRESH_CONTACT_TTL_DAYS = DETAILS_CACHE_TTL_DAYS                              # phone/website via Place Details
+REFRESH_EMAIL_TTL_DAYS   = float(os.getenv("REFRESH_EMAIL_TTL_DAYS", "90"))    # re-scan a website for emails
+REFRESH_MAX_QUERIES      = int(os.getenv("REFRESH_MAX_QUERIES", "0"))
+REFRESH_MAX_DETAILS      = int(os.getenv("REFRESH_MAX_DETAILS", "500"))
+REFRESH_MAX_EMAILS       = int(os.getenv("EMAIL_LIMIT", "200"))
+JOURNAL_KEEP_DAYS        = float(os.getenv("JOURNAL_KEEP_DAYS", "30"))  # finished crawl runs kept in the journal (at least the ratings TTL)
+
+# Fuzzy entity resolution (rapidfuzz), run after each crawl
+FUZZY_DEDUPE    = os.getenv("FUZZY_DEDUPE", "1") not in ("0", "", "false")
+FUZZY_THRESHOLD = float(os.getenv("FUZZY_THRESHOLD", "88"))
+
+# Export: format follows CSV_OUT's extension (.csv, .csv.gz, .parquet)
+EXPORT_INCREMENTAL = os.getenv("EXPORT_INCREMENTAL", "0") not in ("0", "", "false")
+EXPORT_CHUNK       = int(os.getenv("EXPORT_CHUNK", "5000"))
+
+# Run reports: <job>_report.json + mitigator_<job>.prom (node_exporter textfile) land here
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.dirname(DB_PATH) or ".")
+
 KEYWORDS = [
     "water damage restoration",
     "fire damage restoration",
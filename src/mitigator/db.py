@@ -0,0 +1,146 @@
+# src/mitigator/db.py
+"""
+SQLite access for every module. Connections run in WAL mode with tuned pragmas,
+so readers (dashboard, exports, planners) never block the writer or each other.
+Readers borrow pooled connections, which keep their prepared-statement caches
+warm across calls. All writes in a process go through one writer thread:
+producers on any thread submit transactions to its queue instead of contending
+for the lock. That includes the crawl journal, the job queue and the caches
+(whose puts are submitted without waiting). Separate processes (crawl, email workers)
+still share the file; busy_timeout covers the short write windows WAL leaves them.
+"""
+import os, queue, sqlite3, threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Tuple
+from mitigator.config import SQLITE_SYNCHRONOUS, SQLITE_CACHE_MB, SQLITE_MMAP_MB, SQLITE_BUSY_MS, SQLITE_POOL_SIZE, SQLITE_STMT_CACHE
+
+def _pragmas(con: sqlite3.Connection, readonly: bool):
+    con.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_MS}")
+    if not readonly:
+        con.execute("PRAGMA journal_mode = WAL")  # persistent: recorded in the DB file
+        con.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")  # NORMAL is durable enough under WAL
+    con.execute(f"PRAGMA cache_size = {-SQLITE_CACHE_MB * 1024}")  # negative = KiB
+    con.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_MB * 1024 * 1024}")
+    con.execute("PRAGMA temp_store = MEMORY")
+
+def connect(db_path: str, readonly: bool = False, **kw) -> sqlite3.Connection:
+    """A tuned connection of the caller's own: db_init's schema setup and read-only shard scans; everything else uses reader()/write()."""
+    kw.setdefault("timeout", SQLITE_BUSY_MS / 1000)
+    kw.setdefault("cached_statements", SQLITE_STMT_CACHE)
+    if readonly:
+        if not Path(db_path).exists():
+            raise FileNotFoundError(f"DB not found: {db_path}")
+        con = sqlite3.connect(f"file:{Path(db_path).resolve().as_posix()}?mode=ro", uri=True, **kw)
+    else:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(db_path, **kw)
+    _pragmas(con, readonly)
+    return con
+
+class Pool:
+    """Up to size idle connections to one DB, shared by threads."""
+    def __init__(self, db_path: str, readonly: bool = False, size: int = SQLITE_POOL_SIZE):
+        self.db_path, self.readonly = db_path, readonly
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=size)  # LIFO: the warmest statement cache first
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            con = self._idle.get_nowait()
+        except queue.Empty:
+            con = connect(self.db_path, self.readonly, check_same_thread=False)
+        try:
+            yield con
+        finally:
+            if con.in_transaction:
+                con.rollback()
+            try:
+                self._idle.put_nowait(con)
+            except queue.Full:
+                con.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+class Writer:
+    """The single writer for one DB: runs submitted fn(con) calls one at a time, each in its own transaction."""
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._q: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name=f"sqlite-writer:{Path(db_path).name}", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        con = connect(self.db_path, isolation_level=None)  # explicit BEGIN IMMEDIATE/COMMIT below
+        while True:
+            fn, fut = self._q.get()
+            if fn is None:
+                break
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                con.execute("BEGIN IMMEDIATE")
+                out = fn(con)
+                con.execute("COMMIT")
+            except BaseException as e:
+                if con.in_transaction:
+                    con.execute("ROLLBACK")
+                fut.set_exception(e)
+            else:
+                fut.set_result(out)
+        con.close()
+
+    def submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Future:
+        fut: Future = Future()
+        self._q.put((fn, fut))
+        return fut
+
+    def run(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Submit fn and wait for its result (its exception is re-raised here)."""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("nested write: use the connection fn was given")
+        return self.submit(fn).result()
+
+    def close(self):
+        self._q.put((None, None))
+        self._thread.join()
+
+_lock = threading.Lock()
+_pools: Dict[Tuple, Pool] = {}
+_writers: Dict[Tuple, Writer] = {}
+
+def _key(db_path: str, *extra) -> Tuple:
+    # per process (workers may fork) and per file (a reset DB gets fresh connections)
+    p = Path(db_path).resolve()
+    return (os.getpid(), str(p), p.stat().st_ino if p.exists() else None, *extra)
+
+@contextmanager
+def reader(db_path: str) -> Iterator[sqlite3.Connection]:
+    """A pooled read-only connection; raises FileNotFoundError if the DB does not exist."""
+    key = _key(db_path, "ro")
+    if key[2] is None:
+        raise FileNotFoundError(f"DB not found: {db_path}")
+    with _lock:
+        pool = _pools.get(key) or _pools.setdefault(key, Pool(db_path, readonly=True))
+    with pool.connection() as con:
+        yield con
+
+def writer(db_path: str) -> Writer:
+    if not Path(db_path).exists():
+        connect(db_path).close()  # key the writer on the file it will write to
+    key = _key(db_path)
+    with _lock:
+        w = _writers.get(key)
+        if w is None:
+            w = _writers[key] = Writer(db_path)
+        return w
+
+def write(db_path: str, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+    """Run fn(con) as one transaction on db_path's writer thread; returns its result."""
+    return writer(db_path).run(fn)
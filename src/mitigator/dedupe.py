@@ -1,62 +1,30 @@
-import re, tldextract
 import time
 from typing import Dict, Any
+from mitigator.normalize import (  # re-exported for existing callers
+    COMMON_SUFFIXES, norm_phone, norm_website, norm_name, extract_city_state, root_domain,
+)
 
-COMMON_SUFFIXES = r"\b(inc|llc|l\.l\.c|co|corp|corporation|company|ltd|limited|restoration|services?)\b"
-
-def norm_phone(phone: str | None) -> str | None:
-    if not phone: return None
-    digits = re.sub(r"\D", "", phone)
-    return digits or None
-
-def norm_website(url: str | None) -> str | None:
-    if not url: return None
-    u = url.strip().lower()
-    u = re.sub(r"^https?://", "", u)
-    u = re.sub(r"^www\.", "", u)
-    u = u.split("/")[0]
-    # root domain only
-    ext = tldextract.extract(u)
-    if not ext.domain: return None
-    root = f"{ext.domain}.{ext.suffix}" if ext.suffix else ext.domain
-    return root
-
-def norm_name(name: str | None) -> str | None:
-    if not name: return None
-    n = name.lower()
-    n = re.sub(COMMON_SUFFIXES, "", n)
-    n = re.sub(r"[^a-z0-9]+", " ", n)
-    n = re.sub(r"\s+", " ", n).strip()
-    return n or None
-
-def extract_city_state(address: str | None) -> tuple[str|None, str|None]:
-    if not address: return (None, None)
-    m = re.search(r",\s*([^,]+),\s*([A-Z]{2})\b", address)
-    if not m: return (None, None)
-    return (m.group(1).strip().lower(), m.group(2).strip().upper())
+# listing/aggregator sites: a URL there says nothing about which business it is
+SHARED_DOMAINS = {"yelp.com", "facebook.com", "google.com", "business.site", "nextdoor.com", "angi.com", "homeadvisor.com"}
 
-def entity_key(row: Dict[str, Any]) -> str | None:
+def entity_keys(row: Dict[str, Any]) -> list[str]:
+    """Every normalized identity key for a row (phone, domain, name+place), strongest first."""
+    keys = []
     p = norm_phone(row.get("phone"))
-    if p: return f"ph:{p}"
+    if p: keys.append(f"ph:{p}")
     w = norm_website(row.get("website"))
-    if w: return f"ws:{w}"
+    if w and w not in SHARED_DOMAINS: keys.append(f"ws:{w}")
     n = norm_name(row.get("name"))
     city, state = extract_city_state(row.get("address"))
     if n and city and state:
-        return f"nm:{n}|{city}|{state}"
-    if n and state:
-        return f"nm:{n}|{state}"
-    return None
-
-def root_domain(url: str | None) -> str | None:
-    if not url: return None
-    u = url.strip().lower()
-    u = re.sub(r"^https?://", "", u)
-    u = re.sub(r"^www\.", "", u)
-    u = u.split("/")[0]
-    ext = tldextract.extract(u)
-    if not ext.domain: return None
-    return f"{ext.domain}.{ext.suffix}" if ext.suffix else ext.domain
+        keys.append(f"nm:{n}|{city}|{state}")
+    elif n and state:
+        keys.append(f"nm:{n}|{state}")
+    return keys
+
+def entity_key(row: Dict[str, Any]) -> str | None:
+    keys = entity_keys(row)
+    return keys[0] if keys else None
 
 def choose_email(existing: dict, incoming: dict) -> tuple[str|None, float|None, str|None]:
     e_email, e_conf = existing.get("email"), existing.get("email_confidence") or 0.0
@@ -106,3 +74,29 @@ def merge_rows(existing: Dict[str, Any], incoming: Dict[str, Any]) -> Dict[str,
         out["email_last_seen"] = max((existing.get("email_last_seen") or ""), time.strftime("%Y-%m-%d"))
 
     return out
+
+class UnionFind:
+    """Disjoint sets over hashable items; the smaller item wins as root."""
+    def __init__(self):
+        self.parent: Dict[Any, Any] = {}
+
+    def find(self, x):
+        parent = self.parent
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]  # path halving
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            if rb < ra: ra, rb = rb, ra
+            self.parent[rb] = ra
+        return ra
+
+    def groups(self) -> Dict[Any, list]:
+        out: Dict[Any, list] = {}
+        for x in self.parent:
+            out.setdefault(self.find(x), []).append(x)
+        return out
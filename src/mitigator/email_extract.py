@@ -1,12 +1,22 @@
 # src/mitigator/email_extract.py
-import re, time
-from typing import cast
+import codecs, hashlib, os, re, time
+from typing import Iterator, Optional
 from urllib.parse import urljoin, urlparse
 import requests
-from bs4 import BeautifulSoup
+from mitigator import metrics
+from mitigator.net import DomainThrottle
+from mitigator.page_cache import PageCache
 
 EMAIL_RE = re.compile(r"[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}", re.I)
+MAILTO_RE = re.compile(r"""href\s*=\s*["']?mailto:([^"'?>\s]+)""", re.I)
+# last char that can never be inside an email or mailto href; text after it is carried to the next chunk
+BOUNDARY_RE = re.compile(r"[<>\s][^<>\s]*\Z")
 CANDIDATE_PATHS = ["/", "/contact", "/about", "/team", "/privacy", "/impressum"]
+HTML_TYPES = {"text/html", "application/xhtml+xml", "text/plain"}
+MAX_PAGE_BYTES = int(os.getenv("EMAIL_MAX_PAGE_BYTES", str(512 * 1024)))
+CHUNK_BYTES = 16 * 1024
+MAX_CARRY = 4096  # longest run without a boundary we hold back
+HIGH_CONFIDENCE = 0.9  # stop crawling a site once an address this good is found
 
 def get_root(url: str) -> str:
     u = urlparse(url if url.startswith("http") else f"https://{url}")
@@ -14,47 +24,151 @@ def get_root(url: str) -> str:
     netloc = u.netloc or u.path
     return f"{scheme}://{netloc}"
 
-def fetch(url: str, session: requests.Session, timeout=15) -> str:
-    r = session.get(url, timeout=timeout, headers={"User-Agent": "mitigator/1.0"})
-    r.raise_for_status()
-    return r.text
+def open_page(url: str, session: requests.Session, timeout=15, headers: Optional[dict] = None) -> requests.Response:
+    """Start a streamed GET; the caller reads (or closes) the body."""
+    t = time.perf_counter()
+    try:
+        r = session.get(url, timeout=timeout, headers={"User-Agent": "mitigator/1.0", **(headers or {})}, stream=True)
+    except requests.RequestException:
+        metrics.inc("http_requests_total", provider="website", status="error")
+        raise
+    metrics.observe("http_latency_seconds", time.perf_counter() - t, provider="website")
+    metrics.inc("http_requests_total", provider="website", status=r.status_code)
+    return r
+
+def _decoder(encoding: Optional[str]) -> codecs.IncrementalDecoder:
+    """Incremental decoder for a response charset; unknown ones (e.g. "utf8mb4") fall back to utf-8."""
+    try:
+        return codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+def stream_text(r: requests.Response, max_bytes: int = MAX_PAGE_BYTES) -> Iterator[str]:
+    """
+    Yield decoded text of an HTML response chunk by chunk, stopping after max_bytes.
+    Non-HTML responses yield nothing. Each piece ends on a tag/whitespace boundary
+    so regexes never see half an address.
+    """
+    ctype = (r.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+    if ctype and ctype not in HTML_TYPES:
+        return
+    decoder = _decoder(r.encoding)
+    carry, read = "", 0
+    for chunk in r.iter_content(CHUNK_BYTES):
+        read += len(chunk)
+        text = carry + decoder.decode(chunk)
+        m = BOUNDARY_RE.search(text)
+        cut = m.start() + 1 if m else (len(text) if len(text) > MAX_CARRY else 0)
+        carry = text[cut:]
+        yield text[:cut]
+        if read >= max_bytes:
+            return  # truncated: the carry may be half an address, drop it
+    yield carry + decoder.decode(b"", final=True)
+
+def fetch_stream(url: str, session: requests.Session, max_bytes: int = MAX_PAGE_BYTES, timeout=15) -> Iterator[str]:
+    with open_page(url, session, timeout) as r:
+        r.raise_for_status()
+        yield from stream_text(r, max_bytes)
 
 def emails_from_html(html: str) -> set[str]:
     return {e.strip() for e in EMAIL_RE.findall(html or "")}
 
-def extract_emails(website: str, max_pages: int = 5, sleep_s: float = 0.25):
+def mailtos_from_html(html: str) -> set[str]:
+    return {a for a in MAILTO_RE.findall(html or "") if EMAIL_RE.fullmatch(a)}
+
+def scan_page(url: str, session: requests.Session, mailto: bool = False,
+              max_bytes: int = MAX_PAGE_BYTES, cache: Optional[PageCache] = None) -> tuple[set[str], set[str]]:
+    """Return (emails, mailto addresses) from a streamed page; stops early on a mailto hit."""
+    if cache is not None:
+        return _scan_cached(url, session, mailto, max_bytes, cache)
+    emails: set[str] = set()
+    mailtos: set[str] = set()
+    for text in fetch_stream(url, session, max_bytes):
+        emails |= emails_from_html(text)
+        if mailto:
+            mailtos |= mailtos_from_html(text)
+            if mailtos:
+                break
+    return emails, mailtos
+
+def _scan_cached(url: str, session: requests.Session, mailto: bool, max_bytes: int,
+                 cache: PageCache) -> tuple[set[str], set[str]]:
+    """scan_page via the page cache: conditional GET, and no re-extraction when the content hash is unchanged."""
+    domain = urlparse(url).netloc
+    prev = cache.get(url)
+    headers = {}
+    if prev and prev["etag"]:
+        headers["If-None-Match"] = prev["etag"]
+    if prev and prev["last_modified"]:
+        headers["If-Modified-Since"] = prev["last_modified"]
+    with open_page(url, session, headers=headers) as r:
+        if r.status_code == 304 and prev:
+            cache.touch(url)
+            metrics.inc("cache_requests_total", cache="pages", result="not_modified")
+            return prev["emails"], prev["mailtos"]
+        if r.status_code == 404:
+            cache.put_missing(url, domain)
+        r.raise_for_status()
+        # the whole page is needed for its hash, so no early stop on a mailto here
+        pieces = list(stream_text(r, max_bytes))
+        etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+    h = hashlib.blake2b(digest_size=16)
+    for p in pieces:
+        h.update(p.encode("utf-8", "replace"))
+    digest = h.hexdigest()
+    if prev and prev["content_hash"] == digest:
+        emails, mailtos = prev["emails"], prev["mailtos"]
+        metrics.inc("cache_requests_total", cache="pages", result="unchanged")
+    else:
+        html = "".join(pieces)
+        emails, mailtos = emails_from_html(html), mailtos_from_html(html) if mailto else set()
+        metrics.inc("cache_requests_total", cache="pages", result="changed" if prev else "new")
+    cache.put(url, domain, etag, last_modified, digest, emails, mailtos)
+    return emails, mailtos
+
+def extract_emails(website: str, max_pages: int = 5, sleep_s: float = 0.25,
+                   session: Optional[requests.Session] = None, throttle: Optional[DomainThrottle] = None,
+                   cache: Optional[PageCache] = None):
+    """
+    Crawl a site's likely contact pages for emails, best first. With a throttle,
+    pacing is per domain (shared across threads) instead of sleeping sleep_s.
+    With a page cache, re-runs use conditional GETs and skip paths that 404'd.
+    """
     if not website:
         return []
     base = get_root(website)
-    session = requests.Session()
+    session = session or requests.Session()
+    domain = urlparse(base).netloc
     seen, results = set(), []
     queue = [urljoin(base, p) for p in CANDIDATE_PATHS]
+    if cache is not None:
+        missing = cache.missing(domain)
+        metrics.inc("cache_requests_total", sum(u in missing for u in queue), cache="pages", result="skipped_404")
+        queue = [u for u in queue if u not in missing]
     while queue and len(seen) < max_pages:
         url = queue.pop(0)
         if url in seen:
             continue
         seen.add(url)
+        if throttle is not None:
+            throttle.wait(domain)
+        # harvest mailto on the root page
+        is_root = url.rstrip("/") == base.rstrip("/")
         try:
-            html = fetch(url, session)
+            emails, mailtos = scan_page(url, session, mailto=is_root, cache=cache)
         except requests.RequestException:
             continue
-        emails = emails_from_html(html)
         if emails:
             is_contact = any(x in url for x in ("/contact", "/about", "/team"))
             conf = 0.9 if is_contact else 0.7
             for e in emails:
                 results.append((e, conf, "website"))
-        # harvest mailto on the root page
-        if url.rstrip("/") == base.rstrip("/"):
-            soup = BeautifulSoup(html, "html.parser")
-            for a in soup.select("a[href^='mailto:']"):
-                href = a.get("href")
-                if not href:
-                    continue
-                addr = href[7:]
-                if EMAIL_RE.fullmatch(cast(str, addr)):
-                    results.append((addr, 0.95, "website"))
-        time.sleep(sleep_s)
+        for addr in mailtos:
+            results.append((addr, 0.95, "website"))
+        if any(c >= HIGH_CONFIDENCE for _, c, _ in results):
+            break
+        if throttle is None:
+            time.sleep(sleep_s)
     # dedupe by lowercase, keep highest confidence
     out, seen_lower = [], {}
     for e, c, s in sorted(results, key=lambda x: -x[1]):
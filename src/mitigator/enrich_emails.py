@@ -1,39 +1,157 @@
 # src/mitigator/scripts/enrich_emails.py
-import os, sqlite3, time
+import argparse, os, socket, threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import date
+from typing import Any, Dict, Tuple
+from mitigator import metrics
+from mitigator.db import reader, write
 from mitigator.email_extract import extract_emails
-from mitigator.config import DB_PATH
+from mitigator.jobqueue import SqliteJobQueue
+from mitigator.page_cache import PageCache
+from mitigator.config import DB_PATH, METRICS_DIR, PAGE_CACHE_DB, REFRESH_MAX_EMAILS
+from mitigator.net import DomainThrottle, pooled_session
+from mitigator.refresh import due_emails
+from mitigator.store import db_init
 
 MAX_PAGES = int(os.getenv("EMAIL_MAX_PAGES", "5"))
-SLEEP_S   = float(os.getenv("EMAIL_SLEEP_S", "0.25"))
-LIMIT     = int(os.getenv("EMAIL_LIMIT", "200"))  # cap per run
-
-def main():
-    con = sqlite3.connect(DB_PATH); cur = con.cursor()
-    rows = cur.execute("""
-      SELECT id, website FROM companies
-      WHERE (email IS NULL OR email = '')
-        AND website IS NOT NULL AND website <> ''
-      LIMIT ?
-    """, (LIMIT,)).fetchall()
+SLEEP_S   = float(os.getenv("EMAIL_SLEEP_S", "0.25"))  # min gap between requests to one domain
+LIMIT     = REFRESH_MAX_EMAILS  # cap per run (EMAIL_LIMIT)
+WORKERS   = int(os.getenv("EMAIL_WORKERS", "16"))  # sites in flight
+BATCH     = int(os.getenv("EMAIL_BATCH", "100"))   # jobs claimed (and rows written) at a time
+LEASE_S   = float(os.getenv("EMAIL_LEASE_S", "300"))  # a claimed batch not renewed for this long is reclaimed
+PROCESSES = int(os.getenv("EMAIL_PROCESSES", "1"))
+QUEUE_DB  = os.getenv("EMAIL_QUEUE_DB", DB_PATH)  # a local file: WAL needs shared memory, so workers share one host
 
+def _flush(pending: list):
+    if not pending:
+        return
+    # a scan that found nothing keeps the old email but still counts as checked
+    write(DB_PATH, lambda con: con.executemany("""
+      UPDATE companies
+      SET email = COALESCE(?, email), email_confidence = COALESCE(?, email_confidence),
+          email_source = COALESCE(?, email_source), email_last_seen = COALESCE(?, email_last_seen),
+          email_checked = ?, has_email = MAX(COALESCE(has_email, 0), ?)
+      WHERE id = ?
+    """, pending))
+    pending.clear()
+
+def open_queue():
+    return SqliteJobQueue(QUEUE_DB, "emails", lease_s=LEASE_S)
+
+def enqueue(queue=None) -> int:
+    """Queue every company whose email scan is due (see mitigator.refresh)."""
+    db_init(DB_PATH)  # adds email_checked to older DBs
+    with reader(DB_PATH) as con:
+        rows = due_emails(con, budget=LIMIT)  # never scanned or stale, stalest first
+    q = queue or open_queue()
+    n = q.enqueue((str(cid), {"website": site}) for cid, site in rows)
+    if queue is None:
+        q.close()
+    return n
+
+def work(queue=None, worker: str = "") -> int:
+    """Claim batches until the queue is empty, renewing leases while they are scanned; returns companies updated."""
+    q = queue or open_queue()
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    held: set[str] = set()
+    lock, stop = threading.Lock(), threading.Event()
+    def heartbeat():
+        while not stop.wait(LEASE_S / 3):
+            with lock:
+                keys = list(held)
+            if keys:
+                q.renew(worker, keys)
+    threading.Thread(target=heartbeat, daemon=True).start()
+
+    session = pooled_session(WORKERS)
+    throttle = DomainThrottle(SLEEP_S)
+    cache = PageCache(PAGE_CACHE_DB)
     updated = 0
-    for cid, site in rows:
-        emails = extract_emails(site, max_pages=MAX_PAGES, sleep_s=SLEEP_S)
-        print(emails)
-        if not emails:
-            continue
-        # pick best (first sorted by confidence)
-        e, conf, src = emails[0]
-        cur.execute("""
-          UPDATE companies
-          SET email = ?, email_confidence = ?, email_source = ?, email_last_seen = ?
-          WHERE id = ?
-        """, (e, conf, src, date.today().isoformat(), cid))
-        updated += 1
-        # mild pacing between domains
-        time.sleep(0.1)
-    con.commit(); con.close()
+    try:
+        with metrics.stage("emails"), ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            while True:
+                jobs = q.claim(worker, BATCH)
+                if not jobs:
+                    break
+                with lock:
+                    held.update(k for k, _ in jobs)
+                futs = {pool.submit(extract_emails, p["website"], MAX_PAGES, SLEEP_S, session, throttle, cache): k
+                        for k, p in jobs}
+                pending, done = [], []
+                for fut in as_completed(futs):
+                    key = futs[fut]
+                    try:
+                        emails = fut.result()
+                    except Exception as e:
+                        q.fail(worker, key, f"{type(e).__name__}: {e}")
+                        continue
+                    metrics.inc("sites_scanned_total", found=bool(emails))
+                    today = date.today().isoformat()
+                    if emails:
+                        # pick best (first sorted by confidence)
+                        e, conf, src = emails[0]
+                        pending.append((e, conf, src, today, today, 1, int(key)))
+                        updated += 1
+                    else:
+                        pending.append((None, None, None, None, today, 0, int(key)))
+                    done.append(key)
+                # results first, then ack: a lost ack only costs a redundant rescan
+                _flush(pending)
+                q.complete(worker, done)
+                with lock:
+                    held.difference_update(k for k, _ in jobs)
+    finally:
+        stop.set()
+        with lock:
+            if held:
+                q.release(worker, held)
+        cache.close()
+        if queue is None:
+            q.close()
+    metrics.inc("rows_total", updated, result="email_updated")
+    return updated
+
+def _work_child(_) -> Tuple[int, Dict[str, Any]]:
+    """work() in a pool process; returns its metrics too, which would otherwise die with the process."""
+    metrics.METRICS.reset()  # a forked child starts with a copy of the parent's
+    return work(), metrics.METRICS.dump()
+
+def work_processes(n: int) -> int:
+    """Run n worker processes against the shared queue; returns companies updated."""
+    if n <= 1:
+        return work()
+    updated = 0
+    with ProcessPoolExecutor(max_workers=n) as pool:
+        for done, dump in pool.map(_work_child, range(n)):
+            updated += done
+            metrics.METRICS.merge(dump)
+    return updated
+
+def enrich(processes: int = PROCESSES) -> int:
+    queued = enqueue()
+    print(f"Queued {queued} websites for email scan.")
+    return work_processes(processes)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="enrich_emails")
+    ap.add_argument("cmd", nargs="?", default="run", choices=("run", "enqueue", "work"),
+                    help="run = enqueue + work (default); enqueue/work split them, e.g. one enqueuer and several worker runs")
+    ap.add_argument("--processes", type=int, default=PROCESSES, help="worker processes on this host")
+    ap.add_argument("--profile", action="store_true", help=f"run under cProfile, stats to {METRICS_DIR}/emails.prof")
+    args = ap.parse_args(argv)
+    if args.cmd == "enqueue":
+        print(f"Queued {enqueue()} websites for email scan.")
+        return
+    fn = (lambda: work_processes(args.processes)) if args.cmd == "work" else (lambda: enrich(args.processes))
+    status = "failed"
+    try:
+        if args.profile:
+            updated = metrics.profiled(fn, os.path.join(METRICS_DIR, "emails.prof"))
+        else:
+            updated = fn()
+        status = "ok"
+    finally:
+        print(f"Run report: {metrics.report('emails', status=status)}")
     print(f"Email enrichment updated {updated} companies.")
 
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+# src/mitigator/export.py
+import csv, gzip, os, sqlite3
+from pathlib import Path
+from typing import Iterator, List, Optional
+from mitigator import metrics
+from mitigator.config import EXPORT_CHUNK
+from mitigator.db import reader, write
+
+FORMATS = ("csv", "csv.gz", "parquet")
+
+def detect_format(path: str) -> str:
+    p = path.lower()
+    if p.endswith(".parquet"): return "parquet"
+    if p.endswith(".gz"): return "csv.gz"
+    return "csv"
+
+def watermark_key(out: str) -> str:
+    return f"export_seq:{Path(out).resolve().as_posix()}"
+
+def _chunks(cur: sqlite3.Cursor, chunk: int) -> Iterator[List[tuple]]:
+    while True:
+        rows = cur.fetchmany(chunk)
+        if not rows:
+            return
+        yield rows
+
+def _write_csv(cur, cols, path: str, gz: bool, chunk: int) -> int:
+    n = 0
+    opener = gzip.open if gz else open
+    with opener(path, "wt", newline="", encoding="utf-8") as f:
+        w = csv.writer(f); w.writerow(cols)
+        for rows in _chunks(cur, chunk):
+            w.writerows(rows); n += len(rows)
+    return n
+
+def _write_parquet(cur, cols, decl_types, path: str, chunk: int) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet export needs pyarrow: pip install 'mitigation-finder[parquet]'")
+    types = {"INTEGER": pa.int64(), "REAL": pa.float64()}
+    schema = pa.schema([(c, types.get(t.upper(), pa.string())) for c, t in zip(cols, decl_types)])
+    n = 0
+    with pq.ParquetWriter(path, schema) as w:
+        for rows in _chunks(cur, chunk):
+            w.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=f.type) for col, f in zip(zip(*rows), schema)], schema=schema))
+            n += len(rows)
+        if n == 0:
+            w.write_table(schema.empty_table())
+    return n
+
+def export(db_path: str, out: str, fmt: Optional[str] = None, incremental: bool = False,
+           chunk: int = EXPORT_CHUNK) -> int:
+    """
+    Stream companies to out (csv, csv.gz or parquet) in constant memory; returns rows written.
+    Incremental mode writes only rows added or whose last_seen/score changed since the
+    last incremental export to the same path, then advances that path's watermark.
+    """
+    fmt = fmt or detect_format(out)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    key = watermark_key(out)
+    with reader(db_path) as con:  # WAL: the writer carries on while this streams
+        cur = con.cursor()
+        info = cur.execute("PRAGMA table_info(companies)").fetchall()
+        cols, decl_types = [c[1] for c in info], [c[2] for c in info]
+        since = 0
+        if incremental:
+            row = cur.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            since = int(row[0]) if row else 0
+        upto = cur.execute("SELECT COALESCE(MAX(change_seq), 0) FROM companies").fetchone()[0]
+        cur.execute("SELECT * FROM companies WHERE change_seq > ? AND change_seq <= ? ORDER BY change_seq"
+                    if incremental else "SELECT * FROM companies", (since, upto) if incremental else ())
+
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{out}.tmp"
+        with metrics.stage("export"):
+            if fmt == "parquet":
+                n = _write_parquet(cur, cols, decl_types, tmp, chunk)
+            else:
+                n = _write_csv(cur, cols, tmp, fmt == "csv.gz", chunk)
+            os.replace(tmp, out)  # readers never see a half-written file
+    metrics.inc("rows_exported_total", n, format=fmt)
+
+    write(db_path, lambda con: con.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(upto))))
+    return n
@@ -0,0 +1,113 @@
+# src/mitigator/fuzzy.py
+import math
+from collections import Counter
+from itertools import combinations
+from typing import Any, Dict, List, Sequence
+import numpy as np
+from rapidfuzz import fuzz, process
+from mitigator import metrics
+from mitigator.config import FUZZY_THRESHOLD
+from mitigator.db import reader
+from mitigator.dedupe import SHARED_DOMAINS, UnionFind
+from mitigator.normalize import norm_name, norm_phone, root_domain, extract_city_state, normalize_column
+
+GEO_CELL_DEG = 0.001   # ~100m grid cells
+NAME_TOKENS = 2        # rarest name trigrams used as blocking keys
+MAX_BLOCK = 250        # blocks bigger than this carry no signal; skip them
+SMALL_BLOCK = 32       # blocks up to this size are scored as pairs, larger ones with cdist
+NEAR_M = 250           # a name match this close (same lot/building) counts as corroborated
+NAME_SCORER = fuzz.token_sort_ratio  # token_set_ratio scores "Water Damage Pros" 100 against "Seattle Water Damage Pros"
+
+def name_grams(name: str) -> set[str]:
+    """Leading trigram of each word token (numbers carry no name signal)."""
+    return {t[:3] for t in name.split() if len(t) >= 3 and not t.isdigit()}
+
+def blocking_keys(rec: Dict[str, Any], name: str | None, gram_df: Counter) -> list[str]:
+    """Blocks for one record: geo cell, phone, root domain, rare name tokens."""
+    keys = []
+    lat, lng = rec.get("lat"), rec.get("lng")
+    if lat is not None and lng is not None:
+        # four half-cell-shifted grids, so neighbours straddling a cell edge still share a block
+        y, x = lat / GEO_CELL_DEG, lng / GEO_CELL_DEG
+        for dy, dx in ((0, 0), (0.5, 0), (0, 0.5), (0.5, 0.5)):
+            keys.append(f"g{dy}{dx}:{math.floor(y+dy)}:{math.floor(x+dx)}")
+    p = norm_phone(rec.get("phone"))
+    if p:
+        keys.append(f"p:{p}")
+    d = root_domain(rec.get("website"))
+    if d and d not in SHARED_DOMAINS:
+        keys.append(f"d:{d}")
+    if name:
+        city, state = extract_city_state(rec.get("address"))
+        for g in sorted(name_grams(name), key=lambda g: gram_df[g])[:NAME_TOKENS]:
+            keys.append(f"t:{g}|{city or ''}|{state or ''}")
+    return keys
+
+def distance_m(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    """Equirectangular distance between two records (inf if either has no coordinates)."""
+    if None in (a.get("lat"), a.get("lng"), b.get("lat"), b.get("lng")):
+        return math.inf
+    dy = a["lat"] - b["lat"]
+    dx = (a["lng"] - b["lng"]) * math.cos(math.radians((a["lat"] + b["lat"]) / 2))
+    return math.hypot(dx, dy) * 111_320
+
+def corroborated(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """A similar name alone is not enough (franchises, "<City> Water Damage Pros"): the phone, domain or place must agree too."""
+    pa, da = norm_phone(a.get("phone")), root_domain(a.get("website"))
+    return bool((pa and pa == norm_phone(b.get("phone")))
+                or (da and da not in SHARED_DOMAINS and da == root_domain(b.get("website")))
+                or distance_m(a, b) <= NEAR_M)
+
+def fuzzy_clusters(records: Sequence[Dict[str, Any]], threshold: float = FUZZY_THRESHOLD) -> List[List[int]]:
+    """
+    Group records (indices into `records`) that look like the same business: names
+    scoring >= threshold, corroborated by phone, domain or distance. Candidates only
+    come from shared blocks, so cost tracks block sizes instead of n^2; scoring is
+    vectorized (cdist per large block, cpdist over small-block pairs).
+    """
+    names = normalize_column(norm_name, [r.get("name") for r in records])
+    gram_df = Counter(g for n in names if n for g in name_grams(n))
+    blocks: Dict[str, list[int]] = {}
+    for i, r in enumerate(records):
+        for key in blocking_keys(r, names[i], gram_df):
+            blocks.setdefault(key, []).append(i)
+
+    uf = UnionFind()
+    pairs: set = set()
+    def link(a: int, b: int):
+        if corroborated(records[a], records[b]):
+            uf.union(a, b)
+    for members in blocks.values():
+        members = [i for i in members if names[i]]
+        if len(members) < 2 or len(members) > MAX_BLOCK:
+            continue
+        if len(members) <= SMALL_BLOCK:
+            pairs.update(combinations(members, 2))
+            continue
+        block_names = [names[i] for i in members]
+        scores = process.cdist(block_names, block_names, scorer=NAME_SCORER, score_cutoff=threshold, workers=-1)
+        for a, b in zip(*np.nonzero(np.triu(scores, 1))):
+            link(members[a], members[b])
+    # small blocks: score all their (deduped) pairs in one vectorized call
+    if pairs:
+        left, right = zip(*pairs)
+        scores = process.cpdist([names[i] for i in left], [names[j] for j in right],
+                                scorer=NAME_SCORER, score_cutoff=threshold, workers=-1)
+        for k in np.nonzero(scores)[0]:
+            link(left[k], right[k])
+    return [sorted(g) for g in uf.groups().values() if len(g) > 1]
+
+def recluster(db_path: str, threshold: float = FUZZY_THRESHOLD) -> int:
+    """Fuzzy-match every row in the DB and merge each cluster into its oldest row; returns rows merged away."""
+    from mitigator.store import merge_companies
+    with metrics.stage("dedupe"):
+        n = _recluster(db_path, threshold, merge_companies)
+    metrics.inc("rows_total", n, result="fuzzy_merged")
+    return n
+
+def _recluster(db_path: str, threshold: float, merge_companies) -> int:
+    cols = ("id", "name", "phone", "website", "address", "lat", "lng")
+    with reader(db_path) as con:
+        recs = [dict(zip(cols, r)) for r in con.execute(f"SELECT {', '.join(cols)} FROM companies")]
+    groups = [[recs[i]["id"] for i in g] for g in fuzzy_clusters(recs, threshold)]
+    return merge_companies(db_path, groups)
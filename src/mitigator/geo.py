@@ -0,0 +1,71 @@
+# src/mitigator/geo.py
+import math
+from typing import List, Sequence, Tuple
+from mitigator.db import reader
+from mitigator.query import VIEW_COLS
+
+EARTH_MILES = 3958.8
+MILES_PER_DEG = 69.05  # one degree of latitude
+
+def bbox(lat: float, lng: float, miles: float) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lng, max_lng) enclosing a circle of `miles` around a point."""
+    dlat = miles / MILES_PER_DEG
+    dlng = miles / (MILES_PER_DEG * max(math.cos(math.radians(lat)), 1e-6))
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+def haversine_miles(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2)**2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lng2 - lng1) / 2)**2
+    return 2 * EARTH_MILES * math.asin(math.sqrt(a))
+
+def box_sql(box: Tuple[float, float, float, float]) -> Tuple[str, list]:
+    """Condition on companies.id: inside an R*Tree bounding box."""
+    return ("id IN (SELECT id FROM companies_geo WHERE min_lat >= ? AND max_lat <= ? AND min_lng >= ? AND max_lng <= ?)",
+            list(box))
+
+def dist2_sql(lat: float, lng: float) -> Tuple[str, list]:
+    """
+    Squared distance in miles from (lat, lng) as a SQL expression (equirectangular:
+    plain arithmetic, so it needs no math extension and is well under 1% off at city scale).
+    """
+    k = math.cos(math.radians(lat))**2
+    return ("(((lat - ?) * (lat - ?) + (lng - ?) * (lng - ?) * ?) * ?)",
+            [lat, lat, lng, lng, k, MILES_PER_DEG**2])
+
+def within_radius(db_path: str, lat: float, lng: float, miles: float, limit: int | None = None,
+                  columns: Sequence[str] = VIEW_COLS) -> List[tuple]:
+    """Companies within `miles` of a point, nearest first, as (miles, *columns)."""
+    box, box_params = box_sql(bbox(lat, lng, miles))
+    with reader(db_path) as con:
+        rows = con.execute(f"SELECT lat, lng, {', '.join(columns)} FROM companies WHERE {box}", box_params).fetchall()
+    hits = sorted((d, r[2:]) for r in rows for d in [haversine_miles(lat, lng, r[0], r[1])] if d <= miles)
+    return [(round(d, 3), *r) for d, r in hits[:limit]]
+
+def nearest(db_path: str, lat: float, lng: float, k: int = 10, max_miles: float = 200.0,
+            columns: Sequence[str] = VIEW_COLS) -> List[tuple]:
+    """The k closest companies (within max_miles), growing the search box until enough turn up."""
+    miles = 1.0
+    while True:
+        hits = within_radius(db_path, lat, lng, miles, k, columns)
+        if len(hits) >= k or miles >= max_miles:
+            return hits
+        miles = min(miles * 4, max_miles)
+
+def point_in_polygon(lat: float, lng: float, polygon: Sequence[Tuple[float, float]]) -> bool:
+    inside = False
+    j = len(polygon) - 1
+    for i, (yi, xi) in enumerate(polygon):
+        yj, xj = polygon[j]
+        if (yi > lat) != (yj > lat) and lng < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+def within_polygon(db_path: str, polygon: Sequence[Tuple[float, float]],
+                   columns: Sequence[str] = VIEW_COLS) -> List[tuple]:
+    """Companies inside a service-area polygon given as [(lat, lng), ...]."""
+    lats = [p[0] for p in polygon]; lngs = [p[1] for p in polygon]
+    box, box_params = box_sql((min(lats), max(lats), min(lngs), max(lngs)))
+    with reader(db_path) as con:
+        rows = con.execute(f"SELECT lat, lng, {', '.join(columns)} FROM companies WHERE {box}", box_params).fetchall()
+    return [r[2:] for r in rows if point_in_polygon(r[0], r[1], polygon)]
@@ -0,0 +1,175 @@
+# src/mitigator/jobqueue.py
+"""
+Leased work queue. Workers claim batches, renew their leases while working
+(heartbeat) and ack results; a lease that expires (worker died or hung) makes
+its jobs claimable again, up to max_attempts. SqliteJobQueue lets processes on
+one host cooperate through a local DB file (WAL does not work over network
+filesystems); MemoryJobQueue is the in-process stand-in with the same
+interface, for tests or as the template for a networked queue service.
+"""
+import json, threading, time
+from typing import Any, Dict, Iterable, List, Tuple
+from mitigator.db import reader, write
+
+LEASE_S = 300.0
+MAX_ATTEMPTS = 3
+
+Job = Tuple[str, Dict[str, Any]]  # (key, payload)
+
+class SqliteJobQueue:
+    def __init__(self, db_path: str, kind: str, lease_s: float = LEASE_S, max_attempts: int = MAX_ATTEMPTS):
+        self.db_path, self.kind, self.lease_s, self.max_attempts = db_path, kind, lease_s, max_attempts
+        write(db_path, lambda con: (con.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL, key TEXT NOT NULL,
+            payload TEXT,              -- JSON
+            state TEXT NOT NULL,       -- queued|leased|done|failed
+            worker TEXT, lease_until REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT, updated_at REAL,
+            UNIQUE (kind, key)
+        )"""), con.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(kind, state, lease_until)")))
+
+    def _tx(self, fn):
+        # the writer thread's BEGIN IMMEDIATE also makes claims atomic across worker processes
+        return write(self.db_path, fn)
+
+    def enqueue(self, jobs: Iterable[Job]) -> int:
+        """Add jobs; finished ones are queued again, queued/leased ones are left alone. Returns jobs (re)queued."""
+        now = time.time()
+        rows = [(self.kind, key, json.dumps(payload), now) for key, payload in jobs]
+        def run(con):
+            before = con.total_changes
+            con.executemany("""
+              INSERT INTO jobs (kind, key, payload, state, updated_at) VALUES (?,?,?, 'queued', ?)
+              ON CONFLICT (kind, key) DO UPDATE SET
+                payload = excluded.payload, state = 'queued', attempts = 0, error = NULL,
+                worker = NULL, lease_until = NULL, updated_at = excluded.updated_at
+              WHERE state IN ('done', 'failed')
+            """, rows)
+            return con.total_changes - before
+        return self._tx(run)
+
+    def claim(self, worker: str, n: int) -> List[Job]:
+        """Atomically lease up to n queued (or lease-expired) jobs to worker."""
+        now = time.time()
+        def run(con):
+            # expired leases that used up their attempts are given up on
+            con.execute("""UPDATE jobs SET state = 'failed', error = 'lease expired', updated_at = ?
+                           WHERE kind = ? AND state = 'leased' AND lease_until < ? AND attempts >= ?""",
+                        (now, self.kind, now, self.max_attempts))
+            rows = con.execute("""
+              SELECT id, key, payload FROM jobs
+              WHERE kind = ? AND (state = 'queued' OR (state = 'leased' AND lease_until < ?))
+              ORDER BY id LIMIT ?""", (self.kind, now, n)).fetchall()
+            con.executemany("""UPDATE jobs SET state = 'leased', worker = ?, lease_until = ?,
+                               attempts = attempts + 1, updated_at = ? WHERE id = ?""",
+                            [(worker, now + self.lease_s, now, r[0]) for r in rows])
+            return [(key, json.loads(payload)) for _, key, payload in rows]
+        return self._tx(run)
+
+    def _held(self, sql: str, worker: str, keys: Iterable[str], *params) -> int:
+        def run(con):
+            before = con.total_changes
+            con.executemany(sql + " WHERE kind = ? AND key = ? AND worker = ? AND state = 'leased'",
+                            [(*params, self.kind, k, worker) for k in keys])
+            return con.total_changes - before
+        return self._tx(run)
+
+    def renew(self, worker: str, keys: Iterable[str]) -> int:
+        """Heartbeat: extend worker's leases on keys; returns leases still held."""
+        return self._held("UPDATE jobs SET lease_until = ?", worker, keys, time.time() + self.lease_s)
+
+    def complete(self, worker: str, keys: Iterable[str]) -> int:
+        """Ack finished jobs; returns how many were still leased to worker (a lost lease means someone else redoes it)."""
+        return self._held("UPDATE jobs SET state = 'done', lease_until = NULL, updated_at = ?", worker, keys, time.time())
+
+    def fail(self, worker: str, key: str, error: str):
+        """Give a job back for retry, or mark it failed once it has used max_attempts."""
+        self._held("""UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                      error = ?, lease_until = NULL, updated_at = ?""",
+                   worker, [key], self.max_attempts, error, time.time())
+
+    def release(self, worker: str, keys: Iterable[str]) -> int:
+        """Hand unstarted jobs back without spending an attempt (e.g. on shutdown)."""
+        return self._held("UPDATE jobs SET state = 'queued', attempts = attempts - 1, lease_until = NULL, updated_at = ?",
+                          worker, keys, time.time())
+
+    def counts(self) -> Dict[str, int]:
+        with reader(self.db_path) as con:
+            return dict(con.execute("SELECT state, COUNT(*) FROM jobs WHERE kind = ? GROUP BY state", (self.kind,)))
+
+    def close(self):
+        pass  # no connection of its own
+
+class MemoryJobQueue:
+    """In-process stand-in for SqliteJobQueue (same semantics, one process only)."""
+    def __init__(self, kind: str = "", lease_s: float = LEASE_S, max_attempts: int = MAX_ATTEMPTS):
+        self.kind, self.lease_s, self.max_attempts = kind, lease_s, max_attempts
+        self._jobs: Dict[str, Dict[str, Any]] = {}  # insertion-ordered, like ORDER BY id
+        self._lock = threading.Lock()
+
+    def enqueue(self, jobs: Iterable[Job]) -> int:
+        n = 0
+        with self._lock:
+            for key, payload in jobs:
+                j = self._jobs.get(key)
+                if j is None or j["state"] in ("done", "failed"):
+                    self._jobs[key] = {"payload": payload, "state": "queued", "worker": None,
+                                       "lease_until": None, "attempts": 0, "error": None}
+                    n += 1
+        return n
+
+    def claim(self, worker: str, n: int) -> List[Job]:
+        now, out = time.time(), []
+        with self._lock:
+            for key, j in self._jobs.items():
+                expired = j["state"] == "leased" and j["lease_until"] < now
+                if expired and j["attempts"] >= self.max_attempts:
+                    j.update(state="failed", error="lease expired")
+                elif len(out) < n and (j["state"] == "queued" or expired):
+                    j.update(state="leased", worker=worker, lease_until=now + self.lease_s, attempts=j["attempts"] + 1)
+                    out.append((key, j["payload"]))
+        return out
+
+    def _held(self, worker: str, keys: Iterable[str]) -> List[Dict[str, Any]]:
+        return [j for j in (self._jobs.get(k) for k in keys)
+                if j and j["state"] == "leased" and j["worker"] == worker]
+
+    def renew(self, worker: str, keys: Iterable[str]) -> int:
+        with self._lock:
+            held = self._held(worker, keys)
+            for j in held:
+                j["lease_until"] = time.time() + self.lease_s
+            return len(held)
+
+    def complete(self, worker: str, keys: Iterable[str]) -> int:
+        with self._lock:
+            held = self._held(worker, keys)
+            for j in held:
+                j.update(state="done", lease_until=None)
+            return len(held)
+
+    def fail(self, worker: str, key: str, error: str):
+        with self._lock:
+            for j in self._held(worker, [key]):
+                j.update(state="failed" if j["attempts"] >= self.max_attempts else "queued",
+                         error=error, lease_until=None)
+
+    def release(self, worker: str, keys: Iterable[str]) -> int:
+        with self._lock:
+            held = self._held(worker, keys)
+            for j in held:
+                j.update(state="queued", attempts=j["attempts"] - 1, lease_until=None)
+            return len(held)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            out: Dict[str, int] = {}
+            for j in self._jobs.values():
+                out[j["state"]] = out.get(j["state"], 0) + 1
+            return out
+
+    def close(self):
+        pass
@@ -0,0 +1,136 @@
+# src/mitigator/journal.py
+import sqlite3, time
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+from mitigator.config import JOURNAL_KEEP_DAYS, REFRESH_RATINGS_TTL_DAYS
+from mitigator.db import reader, write
+
+Unit = Tuple[str, str, str]  # (provider, keyword, area), as yielded by cli.crawl_jobs
+
+class CrawlJournal:
+    """
+    Checkpoints of a crawl in the DB: each (provider, area, keyword, page) unit is
+    recorded with its row count and resume cursor once stored, and failures with
+    their error, so a crawl that dies midway resumes exactly where it stopped on
+    the next run. Runs older than JOURNAL_KEEP_DAYS are pruned. Writes go
+    through the DB's writer thread; record() joins the transaction storing the rows.
+    """
+    def __init__(self, db_path: str, fresh: bool = False, start: bool = True):
+        self.db_path = db_path
+        write(db_path, self._init_tables)
+        with reader(db_path) as con:
+            last = con.execute("SELECT id, status FROM crawl_runs ORDER BY id DESC LIMIT 1").fetchone()
+        # only a run that never reached finish() (killed midway) is resumed; a 'partial' one
+        # finished with queries still failing, and the planner re-queues those as never completed
+        self.resumed = bool(last) and last[1] == "running" and not fresh
+        self.run_id = None
+        if not start:  # read-only look at the history (e.g. planning)
+            return
+        if self.resumed:
+            self.run_id = last[0]
+            write(db_path, lambda con: con.execute("UPDATE crawl_runs SET status = 'running' WHERE id = ?", (self.run_id,)))
+        else:
+            self.run_id = write(db_path, lambda con: con.execute(
+                "INSERT INTO crawl_runs (started_at, status) VALUES (?, 'running')", (_now(),)).lastrowid)
+
+    @staticmethod
+    def _init_tables(con: sqlite3.Connection):
+        con.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TEXT, finished_at TEXT,
+            status TEXT                -- running|partial|done
+        )""")
+        con.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_journal (
+            run_id INTEGER NOT NULL,
+            provider TEXT NOT NULL, area TEXT NOT NULL, keyword TEXT NOT NULL, page INTEGER NOT NULL,
+            status TEXT,               -- done|failed
+            n_rows INTEGER,
+            next_token TEXT,           -- Google next_page_token after this page (NULL = last page)
+            error TEXT, attempts INTEGER DEFAULT 0,
+            updated_at TEXT,
+            PRIMARY KEY (run_id, provider, area, keyword, page)
+        ) WITHOUT ROWID""")
+        if "rows" in {c[1] for c in con.execute("PRAGMA table_info(crawl_journal)")}:
+            # earlier versions kept every page's rows as JSON, forever; resuming only needs the cursor
+            if sqlite3.sqlite_version_info >= (3, 35):
+                con.execute("ALTER TABLE crawl_journal DROP COLUMN rows")
+            else:
+                con.execute("UPDATE crawl_journal SET rows = NULL WHERE rows IS NOT NULL")
+
+    def pending(self, units: Iterable[Unit]) -> List[Tuple[Unit, Optional[str], int]]:
+        """Units not yet complete, each with the (page_token, page) to continue from."""
+        done: Dict[Unit, Tuple[int, Optional[str]]] = {}
+        with reader(self.db_path) as con:
+            for provider, area, kw, page, token in con.execute("""
+              SELECT provider, area, keyword, page, next_token FROM crawl_journal
+              WHERE run_id = ? AND status = 'done' ORDER BY page""", (self.run_id,)):
+                done[(provider, kw, area)] = (page, token)
+        out = []
+        for unit in units:
+            if unit not in done:
+                out.append((unit, None, 0))
+            elif done[unit][1]:  # stopped between pages: carry on from the saved token
+                out.append((unit, done[unit][1], done[unit][0] + 1))
+        return out
+
+    def record(self, cur: sqlite3.Cursor, unit: Unit, page: int, rows: Sequence[Mapping[str, Any]], next_token: Optional[str]):
+        """Mark a page done; pass the cursor of the transaction that stored its rows."""
+        provider, kw, area = unit
+        cur.execute("""
+          INSERT INTO crawl_journal (run_id, provider, area, keyword, page, status, n_rows, next_token, error, attempts, updated_at)
+          VALUES (?,?,?,?,?, 'done', ?,?, NULL, 1, ?)
+          ON CONFLICT (run_id, provider, area, keyword, page) DO UPDATE SET
+            status = 'done', n_rows = excluded.n_rows, next_token = excluded.next_token,
+            error = NULL, attempts = attempts + 1, updated_at = excluded.updated_at
+        """, (self.run_id, provider, area, kw, page, len(rows), next_token, _now()))
+        if next_token is None:  # query complete; drop failures from pages a restart no longer reached
+            cur.execute("""DELETE FROM crawl_journal WHERE run_id = ? AND provider = ? AND area = ? AND keyword = ?
+                           AND page > ? AND status = 'failed'""", (self.run_id, provider, area, kw, page))
+
+    def fail(self, unit: Unit, page: int, error: str):
+        provider, kw, area = unit
+        write(self.db_path, lambda con: con.execute("""
+          INSERT INTO crawl_journal (run_id, provider, area, keyword, page, status, error, attempts, updated_at)
+          VALUES (?,?,?,?,?, 'failed', ?, 1, ?)
+          ON CONFLICT (run_id, provider, area, keyword, page) DO UPDATE SET
+            status = 'failed', error = excluded.error, attempts = attempts + 1, updated_at = excluded.updated_at
+        """, (self.run_id, provider, area, kw, page, error, _now())))
+
+    def failures(self) -> List[Tuple[str, str, str, int, str, int]]:
+        with reader(self.db_path) as con:
+            return con.execute("""
+              SELECT provider, area, keyword, page, error, attempts FROM crawl_journal
+              WHERE run_id = ? AND status = 'failed'""", (self.run_id,)).fetchall()
+
+    def last_completed(self) -> Dict[Unit, str]:
+        """When each query last finished (its final page stored), over every run."""
+        with reader(self.db_path) as con:
+            return {(provider, kw, area): at for provider, area, kw, at in con.execute("""
+              SELECT provider, area, keyword, MAX(updated_at) FROM crawl_journal
+              WHERE status = 'done' AND next_token IS NULL GROUP BY provider, area, keyword""")}
+
+    def rows_saved(self) -> int:
+        with reader(self.db_path) as con:
+            return con.execute("SELECT COALESCE(SUM(n_rows), 0) FROM crawl_journal WHERE run_id = ? AND status = 'done'",
+                               (self.run_id,)).fetchone()[0]
+
+    def finish(self, complete: bool):
+        """Close the run and prune finished runs past the retention window."""
+        # last_completed() must still see every query the planner could skip, so keep at least its TTL
+        keep_days = max(JOURNAL_KEEP_DAYS, REFRESH_RATINGS_TTL_DAYS)
+        cutoff = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - keep_days * 86400))
+        def tx(con):
+            con.execute("UPDATE crawl_runs SET status = ?, finished_at = ? WHERE id = ?",
+                        ("done" if complete else "partial", _now(), self.run_id))
+            # earlier runs only (one abandoned by --fresh never finished: its start counts)
+            old = "SELECT id FROM crawl_runs WHERE id < ? AND COALESCE(finished_at, started_at) < ?"
+            con.execute(f"DELETE FROM crawl_journal WHERE run_id IN ({old})", (self.run_id, cutoff))
+            con.execute(f"DELETE FROM crawl_runs WHERE id IN ({old})", (self.run_id, cutoff))
+        write(self.db_path, tx)
+
+    def close(self):
+        pass  # no connection of its own; kept for callers
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S")
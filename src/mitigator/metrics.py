@@ -0,0 +1,156 @@
+# src/mitigator/metrics.py
+import cProfile, io, json, os, pstats, threading, time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+from mitigator.config import METRICS_DIR
+
+HIT_RESULTS = {"hit", "not_modified", "unchanged", "skipped_404"}  # cache_requests_total results served from cache
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PREFIX = "mitigator_"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class Metrics:
+    """Thread-safe counters, gauges and latency histograms for one run."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.counters: Dict[Tuple[str, Labels], float] = {}
+            self.gauges: Dict[Tuple[str, Labels], float] = {}
+            self.histograms: Dict[Tuple[str, Labels], list] = {}  # bucket counts..., sum, count
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self.gauges[(name, _labels(labels))] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            h = self.histograms.setdefault(key, [0] * (len(LATENCY_BUCKETS) + 2))
+            for i, b in enumerate(LATENCY_BUCKETS):
+                if value <= b:
+                    h[i] += 1
+            h[-2] += value; h[-1] += 1
+
+    def dump(self) -> Dict[str, Any]:
+        """The raw series (picklable), e.g. for a pool worker to hand back to its parent's merge()."""
+        with self._lock:
+            return {"counters": dict(self.counters), "gauges": dict(self.gauges),
+                    "histograms": {k: list(h) for k, h in self.histograms.items()}}
+
+    def merge(self, dump: Dict[str, Any]):
+        """Fold another registry's dump() into this one: counters and histograms add up, gauges are overwritten."""
+        with self._lock:
+            for k, v in dump["counters"].items():
+                self.counters[k] = self.counters.get(k, 0) + v
+            self.gauges.update(dump["gauges"])
+            for k, h in dump["histograms"].items():
+                mine = self.histograms.setdefault(k, [0] * len(h))
+                for i, v in enumerate(h):
+                    mine[i] += v
+
+    @contextmanager
+    def stage(self, name: str):
+        """Accumulate wall time spent in a pipeline stage."""
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.inc("stage_seconds_total", time.perf_counter() - t, stage=name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        def fmt(key):
+            name, labels = key
+            return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+        with self._lock:
+            out: Dict[str, Any] = {
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "wall_seconds": round(time.time() - self.started, 3),
+                "counters": {fmt(k): round(v, 6) for k, v in sorted(self.counters.items())},
+                "gauges": {fmt(k): v for k, v in sorted(self.gauges.items())},
+                "histograms": {},
+            }
+            for k, h in sorted(self.histograms.items()):
+                out["histograms"][fmt(k)] = {
+                    "buckets": dict(zip([str(b) for b in LATENCY_BUCKETS], h[:-2])),
+                    "sum": round(h[-2], 6), "count": h[-1],
+                    "mean": round(h[-2] / h[-1], 6) if h[-1] else None,
+                }
+            # derived: hit rate per cache
+            caches: Dict[str, list] = {}
+            for (name, labels), v in self.counters.items():
+                if name == "cache_requests_total":
+                    d = dict(labels)
+                    c = caches.setdefault(d.get("cache", ""), [0, 0])
+                    c[0] += v if d.get("result") in HIT_RESULTS else 0
+                    c[1] += v
+            for cache, (h, total) in sorted(caches.items()):
+                out["gauges"][f"cache_hit_rate{{cache={cache}}}"] = round(h / total, 4) if total else None
+        return out
+
+    def prometheus(self) -> str:
+        def lbl(labels: Labels, extra: str = "") -> str:
+            parts = [f'{k}="{v}"' for k, v in labels] + ([extra] if extra else [])
+            return "{" + ",".join(parts) + "}" if parts else ""
+        lines = []
+        with self._lock:
+            for kind, series in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted({n for n, _ in series}):
+                    lines.append(f"# TYPE {PREFIX}{name} {kind}")
+                    lines += [f"{PREFIX}{name}{lbl(l)} {v}" for (n, l), v in sorted(series.items()) if n == name]
+            for name in sorted({n for n, _ in self.histograms}):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for (n, l), h in sorted(self.histograms.items()):
+                    if n != name:
+                        continue
+                    for b, c in list(zip(LATENCY_BUCKETS, h[:-2])) + [("+Inf", h[-1])]:
+                        le = 'le="%s"' % b
+                        lines.append(f"{PREFIX}{name}_bucket{lbl(l, le)} {c}")
+                    lines.append(f"{PREFIX}{name}_sum{lbl(l)} {h[-2]}")
+                    lines.append(f"{PREFIX}{name}_count{lbl(l)} {h[-1]}")
+        lines.append(f"# TYPE {PREFIX}last_run_timestamp_seconds gauge")
+        lines.append(f"{PREFIX}last_run_timestamp_seconds {time.time():.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path: str, prom_path: str, **extra):
+        """Write the JSON run report and the Prometheus textfile (atomically, for the textfile collector)."""
+        for path, text in ((json_path, json.dumps(self.snapshot() | extra, indent=2)), (prom_path, self.prometheus())):
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(f"{path}.tmp", path)
+
+METRICS = Metrics()  # process-wide registry
+inc, observe, stage = METRICS.inc, METRICS.observe, METRICS.stage
+
+def report(job: str, **extra) -> str:
+    """Write <job>_report.json and mitigator_<job>.prom into METRICS_DIR; returns the JSON path."""
+    path = os.path.join(METRICS_DIR, f"{job}_report.json")
+    METRICS.write(path, os.path.join(METRICS_DIR, f"mitigator_{job}.prom"), job=job, **extra)
+    return path
+
+def profiled(fn: Callable[[], Any], out: str) -> Any:
+    """Run fn under cProfile, dump stats to out and print the top entries."""
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(fn)
+    finally:
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+        prof.dump_stats(out)
+        buf = io.StringIO()
+        pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(25)
+        print(buf.getvalue())
+        print(f"Profile written to {out}")
@@ -0,0 +1,109 @@
+# src/mitigator/net.py
+import random, threading, time
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+from mitigator import metrics
+from mitigator.config import PROVIDER_LIMITS, HTTP_MAX_RETRIES, HTTP_BACKOFF_S
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class RateLimiter:
+    """Per-provider request pacing: a QPS spacing plus a cap on in-flight requests."""
+    def __init__(self, qps: float, concurrency: int):
+        self.interval = 1.0 / qps if qps > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+        self._sem = threading.BoundedSemaphore(max(1, concurrency))
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            t = max(now, self._next)
+            self._next = t + self.interval
+        if t > now:
+            time.sleep(t - now)
+
+    def __enter__(self):
+        self._sem.acquire()
+        self.wait()
+        return self
+
+    def __exit__(self, *exc):
+        self._sem.release()
+
+_limiters: dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+_local = threading.local()
+
+def limiter(provider: str) -> RateLimiter:
+    with _limiters_lock:
+        if provider not in _limiters:
+            qps, conc = PROVIDER_LIMITS.get(provider, (0.0, 4))
+            _limiters[provider] = RateLimiter(qps, conc)
+        return _limiters[provider]
+
+def configure(provider: str, qps: float, concurrency: int):
+    with _limiters_lock:
+        _limiters[provider] = RateLimiter(qps, concurrency)
+
+def thread_session() -> requests.Session:
+    """Thread-local session so keep-alive connections are reused across queries."""
+    s = getattr(_local, "session", None)
+    if s is None:
+        s = _local.session = requests.Session()
+    return s
+
+def _retry_after(r: requests.Response) -> Optional[float]:
+    v = r.headers.get("Retry-After")
+    try:
+        return float(v) if v else None
+    except ValueError:
+        return None
+
+def get(provider: str, url: str, session: Optional[requests.Session] = None,
+        retries: int = HTTP_MAX_RETRIES, backoff: float = HTTP_BACKOFF_S, **kwargs) -> requests.Response:
+    """GET through the provider's limiter, retrying 429/5xx and transient errors with backoff."""
+    s = session or thread_session()
+    lim = limiter(provider)
+    for attempt in range(retries + 1):
+        wait = backoff * (2 ** attempt) * (1 + random.random())
+        try:
+            with lim:
+                t = time.perf_counter()
+                r = s.get(url, **kwargs)
+            metrics.observe("http_latency_seconds", time.perf_counter() - t, provider=provider)
+            metrics.inc("http_requests_total", provider=provider, status=r.status_code)
+        except (requests.ConnectionError, requests.Timeout):
+            metrics.inc("http_requests_total", provider=provider, status="error")
+            if attempt == retries:
+                raise
+        else:
+            if r.status_code not in RETRY_STATUS or attempt == retries:
+                return r
+            wait = _retry_after(r) or wait
+        metrics.inc("http_retries_total", provider=provider)
+        time.sleep(wait)
+    raise AssertionError("unreachable")
+
+def pooled_session(pool_size: int) -> requests.Session:
+    """One keep-alive session sized for pool_size threads fetching many hosts at once."""
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    s.mount("http://", adapter); s.mount("https://", adapter)
+    return s
+
+class DomainThrottle:
+    """Per-domain politeness: at most one request per domain every min_interval seconds."""
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, domain: str):
+        with self._lock:
+            now = time.monotonic()
+            t = max(now, self._next.get(domain, 0.0))
+            self._next[domain] = t + self.min_interval
+        if t > now:
+            time.sleep(t - now)
@@ -0,0 +1,78 @@
+# src/mitigator/normalize.py
+import os, re
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, List, Sequence
+import tldextract
+
+CACHE_SIZE = int(os.getenv("NORM_CACHE_SIZE", "65536"))  # entries per normalizer
+# Offline suffix list: tldextract's bundled snapshot, or a local copy via PSL_FILE.
+# Never fetched over the network.
+PSL_FILE = os.getenv("PSL_FILE")
+
+COMMON_SUFFIXES = r"\b(inc|llc|l\.l\.c|co|corp|corporation|company|ltd|limited|restoration|services?)\b"
+
+NON_DIGIT_RE = re.compile(r"\D")
+SCHEME_RE    = re.compile(r"^https?://")
+WWW_RE       = re.compile(r"^www\.")
+SUFFIX_RE    = re.compile(COMMON_SUFFIXES)
+NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+SPACES_RE    = re.compile(r"\s+")
+CITY_STATE_RE = re.compile(r",\s*([^,]+),\s*([A-Z]{2})\b")
+
+_tld = tldextract.TLDExtract(
+    cache_dir=None,
+    suffix_list_urls=(Path(PSL_FILE).resolve().as_uri(),) if PSL_FILE else (),
+    fallback_to_snapshot=True,
+)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def norm_phone(phone: str | None) -> str | None:
+    if not phone: return None
+    digits = NON_DIGIT_RE.sub("", phone)
+    if len(digits) == 11 and digits[0] == "1":
+        digits = digits[1:]  # NANP country code: "+1 206 ..." and "(206) ..." are one number
+    return digits or None
+
+@lru_cache(maxsize=CACHE_SIZE)
+def root_domain(url: str | None) -> str | None:
+    if not url: return None
+    u = url.strip().lower()
+    u = SCHEME_RE.sub("", u)
+    u = WWW_RE.sub("", u)
+    u = u.split("/")[0]
+    ext = _tld(u)
+    if not ext.domain: return None
+    if ext.suffix: return f"{ext.domain}.{ext.suffix}"
+    # unlisted TLD (.test, .internal, ...): its last two labels, not the TLD alone
+    return f"{ext.subdomain.rsplit('.', 1)[-1]}.{ext.domain}" if ext.subdomain else ext.domain
+
+norm_website = root_domain
+
+@lru_cache(maxsize=CACHE_SIZE)
+def norm_name(name: str | None) -> str | None:
+    if not name: return None
+    n = name.lower()
+    n = SUFFIX_RE.sub("", n)
+    n = NON_ALNUM_RE.sub(" ", n)
+    n = SPACES_RE.sub(" ", n).strip()
+    return n or None
+
+@lru_cache(maxsize=CACHE_SIZE)
+def extract_city_state(address: str | None) -> tuple[str|None, str|None]:
+    if not address: return (None, None)
+    m = CITY_STATE_RE.search(address)
+    if not m: return (None, None)
+    return (m.group(1).strip().lower(), m.group(2).strip().upper())
+
+@lru_cache(maxsize=CACHE_SIZE)
+def norm_categories(categories: str | None) -> str | None:
+    """Provider categories as one sorted, de-duplicated, lowercase list ("water_damage" -> "water damage")."""
+    if not categories: return None
+    cats = {SPACES_RE.sub(" ", c.replace("_", " ")).strip().lower() for c in categories.split(",")}
+    return ",".join(sorted(c for c in cats if c)) or None
+
+def normalize_column(fn: Callable[[Any], Any], values: Sequence[Any]) -> List[Any]:
+    """Apply a normalizer to a whole column, computing each distinct value once."""
+    memo = {v: fn(v) for v in set(values)}
+    return [memo[v] for v in values]
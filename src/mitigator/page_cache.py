@@ -0,0 +1,77 @@
+# src/mitigator/page_cache.py
+import json, threading, time
+from concurrent.futures import Future
+from typing import Optional
+from mitigator.config import PAGE_MISSING_TTL_DAYS
+from mitigator.db import reader, write, writer
+
+class PageCache:
+    """
+    What the email scanner last saw at each URL: validators (ETag, Last-Modified),
+    a content hash and the addresses extracted, so re-runs can send conditional
+    GETs and skip re-extraction. 404s are remembered per domain for
+    missing_ttl_days so dead candidate paths are not requested again.
+    Safe to use from the scanner's worker threads; writes go to the DB's writer
+    thread without waiting (flush() waits for them).
+    """
+    def __init__(self, db_path: str, missing_ttl_days: float = PAGE_MISSING_TTL_DAYS):
+        self.missing_ttl_s = missing_ttl_days * 86400
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._last: Optional[Future] = None
+        write(db_path, lambda con: (con.execute("""
+        CREATE TABLE IF NOT EXISTS page_cache (
+            url TEXT PRIMARY KEY,
+            domain TEXT,
+            status INTEGER,            -- 200, or 404 for a missing candidate path
+            etag TEXT, last_modified TEXT,
+            content_hash TEXT,
+            emails TEXT, mailtos TEXT, -- JSON lists
+            fetched_at REAL            -- unix time
+        )"""), con.execute("CREATE INDEX IF NOT EXISTS idx_page_cache_domain ON page_cache(domain, status)")))
+
+    def get(self, url: str) -> Optional[dict]:
+        with reader(self.db_path) as con:
+            row = con.execute("""SELECT etag, last_modified, content_hash, emails, mailtos FROM page_cache
+                                      WHERE url = ? AND status = 200""", (url,)).fetchone()
+        if not row:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "content_hash": row[2],
+                "emails": set(json.loads(row[3] or "[]")), "mailtos": set(json.loads(row[4] or "[]"))}
+
+    def missing(self, domain: str) -> set[str]:
+        """URLs on domain that returned 404 recently enough to skip."""
+        with reader(self.db_path) as con:
+            return {u for (u,) in con.execute(
+                "SELECT url FROM page_cache WHERE domain = ? AND status = 404 AND fetched_at >= ?",
+                (domain, time.time() - self.missing_ttl_s))}
+
+    def put(self, url: str, domain: str, etag: Optional[str], last_modified: Optional[str],
+            content_hash: Optional[str], emails: set[str], mailtos: set[str]):
+        self._write((url, domain, 200, etag, last_modified, content_hash,
+                     json.dumps(sorted(emails)), json.dumps(sorted(mailtos)), time.time()))
+
+    def put_missing(self, url: str, domain: str):
+        self._write((url, domain, 404, None, None, None, None, None, time.time()))
+
+    def touch(self, url: str):
+        """Still valid (304 or same hash): keep the entry, note when it was confirmed."""
+        now = time.time()
+        self._submit(lambda con: con.execute("UPDATE page_cache SET fetched_at = ? WHERE url = ?", (now, url)))
+
+    def _write(self, row: tuple):
+        self._submit(lambda con: con.execute("INSERT OR REPLACE INTO page_cache VALUES (?,?,?,?,?,?,?,?,?)", row))
+
+    def _submit(self, fn):
+        with self._lock:
+            self._last = writer(self.db_path).submit(fn)
+
+    def flush(self):
+        """Wait until every write submitted so far is committed."""
+        with self._lock:
+            last = self._last
+        if last is not None:
+            last.result()
+
+    def close(self):
+        self.flush()
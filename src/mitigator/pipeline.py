@@ -0,0 +1,74 @@
+# src/mitigator/pipeline.py
+"""
+Crawl pipeline: collectors -> normalize -> batch -> store, as chained generators
+over a bounded queue. Collector threads block on the queue when the writer falls
+behind, so memory stays flat however many queries a run covers.
+
+Events are (kind, unit, page, rows, extra) tuples: ("page", ..., rows, next_token),
+("failed", ..., None, error) and ("end", ...) once a query is finished.
+"""
+import queue, threading
+from concurrent.futures import Executor
+from typing import Any, Callable, Iterable, Iterator, List, Tuple
+from mitigator import metrics
+from mitigator.dedupe import entity_keys
+
+Event = Tuple[str, Any, Any, Any, Any]
+POLL_S = 0.1  # how often a collector blocked on a full queue checks whether the consumer is gone
+
+class Outbox:
+    """The collectors' end of the queue."""
+    def __init__(self, maxsize: int):
+        self.q: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.stop = threading.Event()
+
+    def put(self, ev: Event) -> bool:
+        """Block until ev is queued; False (ev dropped) once the consumer has stopped, so the collector should return."""
+        while not self.stop.is_set():
+            try:
+                self.q.put(ev, timeout=POLL_S); return True
+            except queue.Full:
+                pass
+        return False
+
+def collect(pool: Executor, jobs: Iterable[tuple], run: Callable, maxsize: int) -> Iterator[Event]:
+    """
+    Run run(out, *job) on pool for each job and yield page/failed events as they arrive.
+    If the consumer stops early, close the generator (contextlib.closing): jobs not yet
+    started are cancelled and out.put() turns False for running ones, so the pool can exit.
+    """
+    out = Outbox(maxsize)
+    futures = [pool.submit(run, out, *job) for job in jobs]
+    running = len(futures)
+    try:
+        while running:
+            ev = out.q.get()
+            if ev[0] == "end":
+                running -= 1
+            else:
+                metrics.METRICS.set("pipeline_queue_depth", out.q.qsize())
+                yield ev
+    finally:
+        out.stop.set()
+        for f in futures:
+            f.cancel()
+
+def normalize(events: Iterable[Event]) -> Iterator[Event]:
+    """Compute each row's entity keys once, ahead of the store's lookups."""
+    for ev in events:
+        if ev[0] == "page":
+            for r in ev[3]:
+                r.ekeys = entity_keys(r)
+        yield ev
+
+def batched(events: Iterable[Event], max_rows: int) -> Iterator[List[Event]]:
+    """Group consecutive events into batches of about max_rows rows (one store transaction each)."""
+    batch, n = [], 0
+    for ev in events:
+        batch.append(ev)
+        n += len(ev[3] or ())
+        if n >= max_rows:
+            yield batch
+            batch, n = [], 0
+    if batch:
+        yield batch
@@ -0,0 +1,145 @@
+# src/mitigator/query.py
+import re
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+from mitigator.db import reader
+
+SORTABLE = ("score", "rating", "review_count", "name", "relevance", "distance")
+TOKEN_RE = re.compile(r"\w+")
+VIEW_COLS = ("name", "score", "rating", "review_count", "address", "categories", "website", "phone", "email")
+
+def fts_match(text: str, columns: Sequence[str] = ()) -> str | None:
+    """FTS5 query where every word must match as a prefix, optionally limited to columns."""
+    tokens = TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return None
+    expr = " ".join(f'"{t}"*' for t in tokens)
+    return f"{{{' '.join(columns)}}} : ({expr})" if columns else expr
+
+def text_match(filters: Dict[str, Any]) -> str | None:
+    """One MATCH expression for the free-text and category filters, or None."""
+    parts = []
+    text = fts_match(filters.get("text") or "", ("name", "address", "website"))
+    if text: parts.append(text)
+    for token in filters.get("categories") or ():
+        cat = fts_match(token, ("category_list",))
+        if cat: parts.append(cat)
+    return " AND ".join(f"({p})" for p in parts) or None
+
+def where_clause(filters: Dict[str, Any], with_text: bool = True) -> Tuple[str, list]:
+    """
+    Translate dashboard filters into a parameterized WHERE clause. Keys (all optional):
+    text, categories (list of tokens, all must match), cities (any), min_score,
+    min_reviews, max_reviews, has_email, near=(lat, lng, miles). Text and categories
+    go through companies_fts, near through the companies_geo R*Tree.
+    """
+    conds: List[str] = []
+    params: list = []
+    match = text_match(filters) if with_text else None
+    if match:
+        conds.append("id IN (SELECT rowid FROM companies_fts WHERE companies_fts MATCH ?)")
+        params.append(match)
+    cities = list(filters.get("cities") or ())
+    if cities:
+        conds.append(f"city IN ({','.join('?' * len(cities))})"); params += cities
+    if filters.get("min_score"):
+        conds.append("COALESCE(score, 0) >= ?"); params.append(float(filters["min_score"]))
+    if filters.get("min_reviews"):
+        conds.append("COALESCE(review_count, 0) >= ?"); params.append(int(filters["min_reviews"]))
+    if filters.get("max_reviews"):
+        conds.append("COALESCE(review_count, 0) <= ?"); params.append(int(filters["max_reviews"]))
+    if filters.get("has_email"):
+        conds.append("has_email = 1")
+    if filters.get("near"):
+        from mitigator.geo import bbox, box_sql, dist2_sql
+        lat, lng, miles = filters["near"]
+        box, box_params = box_sql(bbox(lat, lng, miles))
+        dist2, dist_params = dist2_sql(lat, lng)
+        conds += [box, f"{dist2} <= ?"]
+        params += box_params + dist_params + [miles * miles]
+    return (" WHERE " + " AND ".join(conds)) if conds else "", params
+
+def page_query(filters: Dict[str, Any], sort_by: str = "score", ascending: bool = False,
+               limit: int | None = 200, offset: int = 0, columns: Sequence[str] = VIEW_COLS) -> Tuple[str, list]:
+    match = text_match(filters)
+    if sort_by not in SORTABLE or (sort_by == "relevance" and not match) or (sort_by == "distance" and not filters.get("near")):
+        sort_by = "score"
+    if sort_by == "relevance":
+        # join the ranked matches instead of filtering by them, best bm25 first
+        where, params = where_clause(filters, with_text=False)
+        source = ("companies JOIN (SELECT rowid AS fts_id, rank AS fts_rank FROM companies_fts"
+                  " WHERE companies_fts MATCH ?) ON fts_id = companies.id")
+        params = [match] + params
+        order = f"fts_rank {'DESC' if ascending else 'ASC'}, id"
+    elif sort_by == "distance":
+        from mitigator.geo import dist2_sql
+        where, params = where_clause(filters)
+        source = "companies"
+        dist2, dist_params = dist2_sql(*filters["near"][:2])
+        params = params + dist_params
+        order = f"{dist2} {'DESC' if ascending else 'ASC'}, id"
+    else:
+        where, params = where_clause(filters)
+        source = "companies"
+        order = f"{sort_by} {'ASC' if ascending else 'DESC'} NULLS LAST, id"
+    sql = f"SELECT {', '.join(columns)} FROM {source}{where} ORDER BY {order}"
+    if limit is not None:
+        sql += " LIMIT ? OFFSET ?"; params = params + [int(limit), int(offset)]
+    return sql, params
+
+def fetch_page(db_path: str, filters: Dict[str, Any], sort_by: str = "score", ascending: bool = False,
+               limit: int = 200, offset: int = 0, columns: Sequence[str] = VIEW_COLS) -> List[tuple]:
+    sql, params = page_query(filters, sort_by, ascending, limit, offset, columns)
+    with reader(db_path) as con:
+        return con.execute(sql, params).fetchall()
+
+def iter_rows(db_path: str, filters: Dict[str, Any], sort_by: str = "score", ascending: bool = False,
+              columns: Sequence[str] = VIEW_COLS, chunk: int = 5000) -> Iterator[tuple]:
+    """Every matching row, streamed from the cursor in chunks."""
+    sql, params = page_query(filters, sort_by, ascending, None, 0, columns)
+    with reader(db_path) as con:
+        cur = con.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunk)
+            if not rows:
+                break
+            yield from rows
+
+def search(db_path: str, text: str, limit: int = 20, columns: Sequence[str] = VIEW_COLS) -> List[tuple]:
+    """Ranked, prefix-aware full-text search over name, address, website and categories."""
+    match = fts_match(text)
+    if not match:
+        return []
+    with reader(db_path) as con:
+        return con.execute(f"""
+          SELECT {', '.join(columns)} FROM companies
+          JOIN (SELECT rowid AS fts_id, rank AS fts_rank FROM companies_fts WHERE companies_fts MATCH ?)
+            ON fts_id = companies.id
+          ORDER BY fts_rank LIMIT ?
+        """, (match, int(limit))).fetchall()
+
+STATS_FILTERS = {"cities", "has_email"}  # filters company_stats can answer on its own
+
+def summary(db_path: str, filters: Dict[str, Any]) -> Dict[str, float]:
+    """Summary tiles; read from the company_stats aggregates unless a filter needs the rows themselves."""
+    where, params = where_clause(filters)
+    if all(k in STATS_FILTERS or not v for k, v in filters.items()):
+        sql = f"""SELECT SUM(companies), SUM(score_sum) / SUM(companies), SUM(rating_sum) / SUM(companies), SUM(reviews_sum)
+                  FROM company_stats{where}"""
+    else:
+        sql = f"""SELECT COUNT(*), AVG(COALESCE(score, 0)), AVG(COALESCE(rating, 0)), SUM(COALESCE(review_count, 0))
+                  FROM companies{where}"""
+    with reader(db_path) as con:
+        n, avg_score, avg_rating, reviews = con.execute(sql, params).fetchone()
+    return {"companies": n or 0, "avg_score": avg_score or 0.0, "avg_rating": avg_rating or 0.0,
+            "total_reviews": reviews or 0}
+
+def distinct_cities(db_path: str) -> List[str]:
+    with reader(db_path) as con:
+        return [c for (c,) in con.execute(
+            "SELECT DISTINCT city FROM company_stats WHERE city <> '' AND companies > 0 ORDER BY city")]
+
+def data_version(db_path: str) -> int:
+    """Bumped by every write to companies; cache dashboard reads on it."""
+    with reader(db_path) as con:
+        row = con.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()
+    return int(row[0]) if row else 0
@@ -0,0 +1,43 @@
+# src/mitigator/record.py
+from collections.abc import Mapping
+from typing import Any, Iterator, Optional
+
+FIELDS = ("source", "source_id", "name", "phone", "website", "address", "lat", "lng", "categories",
+          "rating", "review_count", "license_number", "license_status", "years_in_business",
+          "permits_24mo", "score", "last_seen")
+_FIELD_SET = frozenset(FIELDS)
+
+class Record(Mapping):
+    """
+    One collected company row in a fraction of a dict's memory. Reads like the
+    row dicts it replaces (r["name"], r.get(...), dict(r)); ekeys holds the entity
+    keys once the normalize stage has computed them.
+    """
+    __slots__ = FIELDS + ("ekeys",)
+
+    def __init__(self, **fields: Any):
+        unknown = fields.keys() - _FIELD_SET
+        if unknown:
+            raise TypeError(f"unknown Record fields: {sorted(unknown)}")
+        for f in FIELDS:
+            setattr(self, f, fields.get(f))
+        self.ekeys: Optional[list[str]] = None
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def __repr__(self) -> str:
+        return f"Record({', '.join(f'{f}={getattr(self, f)!r}' for f in FIELDS if getattr(self, f) is not None)})"
@@ -0,0 +1,86 @@
+# src/mitigator/refresh.py
+"""
+Refresh planner: decide per query and per company what is actually due, from
+the journal (queries), the Place Details cache (phone/website) and
+email_checked/email_last_seen (emails). Everything is stalest first and capped
+by a per-run budget.
+"""
+import sqlite3, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Tuple
+from mitigator import metrics
+from mitigator.collect.details_cache import DetailsCache
+from mitigator.collect.google_collect import google_place_details
+from mitigator.config import (CRAWL_WORKERS, REFRESH_RATINGS_TTL_DAYS, REFRESH_CONTACT_TTL_DAYS, REFRESH_EMAIL_TTL_DAYS,
+                              REFRESH_MAX_QUERIES, REFRESH_MAX_DETAILS, REFRESH_MAX_EMAILS)
+from mitigator.db import reader
+from mitigator.journal import CrawlJournal, Unit
+from mitigator.store import update_contacts
+
+def _cap(budget: int) -> int:
+    return budget if budget > 0 else -1  # LIMIT -1 = no limit
+
+def due_queries(journal: CrawlJournal, units: Iterable[Unit], ttl_days: float = REFRESH_RATINGS_TTL_DAYS,
+                budget: int = REFRESH_MAX_QUERIES) -> List[Unit]:
+    """Queries never completed or last completed more than ttl_days ago, stalest first."""
+    cutoff = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - ttl_days * 86400))
+    last = journal.last_completed()
+    due = sorted((last.get(u, ""), i, u) for i, u in enumerate(units) if last.get(u, "") < cutoff)
+    return [u for _, _, u in due[:budget or None]]
+
+def due_details(db_path: str, cache: DetailsCache, ttl_days: float = REFRESH_CONTACT_TTL_DAYS,
+                budget: int = REFRESH_MAX_DETAILS) -> List[Tuple[int, str]]:
+    """(company id, place_id) of Google companies whose phone/website are older than ttl_days, stalest first."""
+    # the cache may live in its own DB (DETAILS_CACHE_DB), so it is matched up here rather than joined
+    fetched = cache.fetched_at()
+    cutoff = time.time() - ttl_days * 86400
+    due = []
+    with reader(db_path) as con:
+        for cid, place_id, phone, website, last_seen in con.execute("""
+          SELECT id, source_id, phone, website, last_seen FROM companies
+          WHERE source = 'google' AND source_id IS NOT NULL"""):
+            at = fetched.get(place_id)
+            if at is None and phone and website and last_seen:
+                # rows crawled before the details cache existed count as fetched on last_seen if complete
+                at = time.mktime(time.strptime(last_seen, "%Y-%m-%d"))
+            if (at or 0) < cutoff:
+                due.append((fetched.get(place_id, 0), cid, place_id))
+    due.sort()
+    return [(cid, place_id) for _, cid, place_id in due[:budget if budget > 0 else None]]
+
+def refresh_details(db_path: str, api_key: str, cache: DetailsCache, budget: int = REFRESH_MAX_DETAILS) -> int:
+    """Re-fetch Place Details for the stalest companies; returns companies updated."""
+    due = due_details(db_path, cache, cache.ttl_s / 86400, budget)
+    if not due:
+        return 0
+    with metrics.stage("details_refresh"), ThreadPoolExecutor(max_workers=CRAWL_WORKERS) as pool:
+        found = list(pool.map(lambda d: google_place_details(api_key, d[1]), due))
+    updates = []
+    for (cid, place_id), d in zip(due, found):
+        if d.get("phone") or d.get("website"):  # both empty = failed lookup; stays due
+            cache.put(place_id, d)
+            updates.append((d.get("phone"), d.get("website"), cid))
+    stats = update_contacts(db_path, updates)  # re-keys, and merges companies a new phone/domain reveals
+    metrics.inc("rows_total", stats["updated"], result="details_refreshed")
+    metrics.inc("rows_total", stats["collapsed"], result="collapsed")
+    return stats["updated"]
+
+def due_emails(con: sqlite3.Connection, ttl_days: float = REFRESH_EMAIL_TTL_DAYS,
+               budget: int = REFRESH_MAX_EMAILS) -> List[Tuple[int, str]]:
+    """(id, website) of companies never scanned for email or scanned more than ttl_days ago, stalest first."""
+    cutoff = (date.today() - timedelta(days=ttl_days)).isoformat()
+    return con.execute("""
+      SELECT id, website FROM companies
+      WHERE website IS NOT NULL AND website <> ''
+        AND COALESCE(email_checked, email_last_seen, '') < ?
+      ORDER BY COALESCE(email_checked, email_last_seen, ''), id
+      LIMIT ?
+    """, (cutoff, _cap(budget))).fetchall()
+
+def plan(db_path: str, journal: CrawlJournal, units: List[Unit], cache: DetailsCache) -> Dict[str, int]:
+    """What the next run would fetch, for `mitigator plan`."""
+    with reader(db_path) as con:
+        emails = len(due_emails(con))
+    return {"queries": len(due_queries(journal, units)), "queries_total": len(units),
+            "details": len(due_details(db_path, cache)), "emails": emails}
@@ -1,18 +1,60 @@
-import math
 from typing import List, Dict, Any
+import numpy as np
+from mitigator import metrics
+from mitigator.db import reader, write
+
+def _arr(values) -> np.ndarray:
+    return np.nan_to_num(np.asarray(values, dtype=float))  # None -> nan -> 0
+
+def score_arrays(rating: np.ndarray, review_count: np.ndarray, permits: np.ndarray,
+                 years: np.ndarray, active: np.ndarray) -> np.ndarray:
+    """The scoring formula over whole columns; permits/years are normalized against these arrays."""
+    max_p = permits.max() if permits.size else 0
+    max_y = years.max() if years.size else 0
+    p_term = permits / max_p if max_p else np.zeros_like(permits)
+    y_term = years / max_y if max_y else np.zeros_like(years)
+    return np.round(
+        0.35*(rating/5.0)*np.log1p(review_count) + 0.35*p_term + 0.15*y_term + 0.15*active, 4
+    )
 
 def compute_scores(rows: List[Dict[str,Any]]):
-    permits = [r.get("permits_24mo") or 0 for r in rows]
-    years   = [r.get("years_in_business") or 0 for r in rows]
-    max_p = max(permits) if permits else 1
-    max_y = max(years) if years else 1
-    for r in rows:
-        rating = (r.get("rating") or 0)/5.0
-        rc = r.get("review_count") or 0
-        rc_term = math.log1p(rc)
-        p_term = ((r.get("permits_24mo") or 0)/max_p) if max_p else 0
-        y_term = ((r.get("years_in_business") or 0)/max_y) if max_y else 0
-        lic_bonus = 1.0 if (r.get("license_status") or "").lower() == "active" else 0.0
-        r["score"] = round(
-            0.35*rating*rc_term + 0.35*p_term + 0.15*y_term + 0.15*lic_bonus, 4
-        )
+    if not rows:
+        return
+    scores = score_arrays(
+        _arr([r.get("rating") for r in rows]),
+        _arr([r.get("review_count") for r in rows]),
+        _arr([r.get("permits_24mo") for r in rows]),
+        _arr([r.get("years_in_business") for r in rows]),
+        _arr([(r.get("license_status") or "").lower() == "active" for r in rows]),
+    )
+    for r, s in zip(rows, scores.tolist()):
+        r["score"] = s
+
+def rescore_db(db_path: str, incremental: bool = True) -> int:
+    """
+    Score every company in one vectorized pass, normalizing over the whole table.
+    Incremental mode only writes rows whose score actually moved (their inputs or
+    the dataset-wide bounds changed). Returns rows written.
+    """
+    with metrics.stage("score"):
+        n = _rescore_db(db_path, incremental)
+    metrics.inc("rows_rescored_total", n)
+    return n
+
+def _rescore_db(db_path: str, incremental: bool) -> int:
+    with reader(db_path) as con:
+        data = con.execute("""
+          SELECT id, rating, review_count, permits_24mo, years_in_business,
+                 LOWER(COALESCE(license_status, '')) = 'active', score
+          FROM companies
+        """).fetchall()
+    if not data:
+        return 0
+    cols = list(zip(*data))
+    ids = np.asarray(cols[0], dtype=np.int64)
+    new = score_arrays(*(_arr(c) for c in cols[1:6]))
+    old = np.asarray(cols[6], dtype=float)
+    mask = (np.isnan(old) | (old != new)) if incremental else np.ones(len(ids), dtype=bool)
+    write(db_path, lambda con: con.executemany("UPDATE companies SET score=? WHERE id=?",
+                                                zip(new[mask].tolist(), ids[mask].tolist())))
+    return int(mask.sum())
@@ -0,0 +1,132 @@
+# src/mitigator/shard.py
+"""
+Sharded crawling: the area x keyword space is split across N workers (processes
+or hosts), each crawling into its own shard DB with its own journal. merge_shards
+then folds every shard into the main DB through upsert_companies, so shard rows
+resolve against each other with the same entity keys and merge_rows semantics as
+a single crawl. Merging is idempotent: a shard unchanged since its last merge is
+skipped, and re-merging a changed one only folds rows into what is already there.
+"""
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
+from mitigator import metrics
+from mitigator.collect.details_cache import DetailsCache
+from mitigator.config import DETAILS_CACHE_DB
+from mitigator.db import connect, reader, write
+from mitigator.journal import Unit
+from mitigator.store import DERIVED_COLS, db_init, upsert_companies
+
+CHUNK = 5000  # shard rows per upsert transaction
+SKIP_COLS = {"id", "entity_key", "change_seq", *DERIVED_COLS}  # recomputed by the main DB
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """"2/8" -> (2, 8); shards are numbered from 0."""
+    i, _, n = spec.partition("/")
+    try:
+        i, n = int(i), int(n)
+    except ValueError:
+        raise ValueError(f"shard must look like I/N, got {spec!r}") from None
+    if not 0 <= i < n:
+        raise ValueError(f"shard {i} out of range for {n} shards")
+    return i, n
+
+def _pair_hash(pair: Tuple[str, str]) -> int:
+    return zlib.crc32("|".join(pair).encode())
+
+def shard_units(units: Iterable[Unit], i: int, n: int) -> List[Unit]:
+    """
+    Shard i's queries. (area, keyword) pairs are dealt round-robin in hash order, so
+    shards get equal shares whatever the config order, and both providers of a pair
+    land on the same shard. Every worker must run with the same KEYWORDS/SERVICE_AREAS.
+    """
+    units = list(units)
+    pairs = sorted({(area, kw) for _, kw, area in units}, key=lambda p: (_pair_hash(p), p))
+    mine = set(pairs[i::n])
+    return [u for u in units if (u[2], u[1]) in mine]
+
+def shard_db_path(db_path: str, i: int, n: int) -> str:
+    p = Path(db_path)
+    return str(p.with_name(f"{p.stem}.shard{i}of{n}{p.suffix}"))
+
+def find_shards(db_path: str) -> List[str]:
+    """Shard DBs sitting next to db_path (crawled here, or copied over from other hosts)."""
+    p = Path(db_path)
+    return sorted(str(s) for s in p.parent.glob(f"{p.stem}.shard*of*{p.suffix}"))
+
+def _rows(shard: str, wanted: Set[str]) -> Iterator[List[Dict[str, Any]]]:
+    """The shard's companies in chunks, limited to the wanted columns (shards from older versions may differ)."""
+    con = connect(shard, readonly=True)
+    try:
+        cur = con.execute("SELECT * FROM companies ORDER BY id")
+        cols = [d[0] for d in cur.description]
+        keep = [i for i, c in enumerate(cols) if c in wanted]
+        while True:
+            chunk = cur.fetchmany(CHUNK)
+            if not chunk:
+                return
+            yield [{cols[i]: r[i] for i in keep} for r in chunk]
+    finally:
+        con.close()
+
+def _version(shard: str) -> str:
+    """
+    What a shard's merge marker records: its db_id and data_version. data_version alone
+    restarts at 0 in every new file, so a re-created shard could match an old marker.
+    Shards from before db_id fall back to their newest change_seq and file size.
+    """
+    con = connect(shard, readonly=True)
+    try:
+        meta = dict(con.execute("SELECT key, value FROM meta WHERE key IN ('db_id', 'data_version')"))
+        if "db_id" in meta:
+            return f"{meta['db_id']}:{meta.get('data_version', '0')}"
+        seq = con.execute("SELECT MAX(change_seq) FROM companies").fetchone()[0]
+        return f"{meta.get('data_version', '0')}:{seq}:{Path(shard).stat().st_size}"
+    finally:
+        con.close()
+
+def _copy_details(shard: str, cache_db: str) -> int:
+    """Carry a shard's Place Details cache over (newest fetch wins), so the main refresh planner sees it."""
+    con = connect(shard, readonly=True)
+    try:
+        if not con.execute("SELECT 1 FROM sqlite_master WHERE name = 'place_details_cache'").fetchone():
+            return 0
+        rows = con.execute("SELECT place_id, phone, website, fetched_at FROM place_details_cache").fetchall()
+    finally:
+        con.close()
+    DetailsCache(cache_db).close()  # creates the table
+    write(cache_db, lambda con: con.executemany("""
+      INSERT INTO place_details_cache VALUES (?,?,?,?)
+      ON CONFLICT (place_id) DO UPDATE SET phone = excluded.phone, website = excluded.website,
+        fetched_at = excluded.fetched_at
+      WHERE excluded.fetched_at > fetched_at
+    """, rows))
+    return len(rows)
+
+def merge_shards(db_path: str, shards: Iterable[str], force: bool = False) -> Dict[str, int]:
+    """Fold shard DBs into db_path; returns shards merged/skipped and row counts summed over them."""
+    db_init(db_path)
+    totals = {"shards": 0, "skipped_shards": 0, "rows": 0, "inserted": 0, "merged": 0, "collapsed": 0}
+    with reader(db_path) as con:
+        wanted = {c[1] for c in con.execute("PRAGMA table_info(companies)")} - SKIP_COLS
+    with metrics.stage("merge"):
+        for shard in shards:
+            if not Path(shard).exists():
+                raise FileNotFoundError(f"shard DB not found: {shard}")
+            key, version = f"merged:{Path(shard).resolve()}", _version(shard)
+            with reader(db_path) as con:
+                done = con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            if done and done[0] == version and not force:
+                totals["skipped_shards"] += 1
+                continue
+            for chunk in _rows(shard, wanted):
+                stats = upsert_companies(db_path, chunk)
+                totals["rows"] += len(chunk)
+                for k in ("inserted", "merged", "collapsed"):
+                    totals[k] += stats[k]
+            if Path(shard).resolve() != Path(DETAILS_CACHE_DB).resolve():
+                _copy_details(shard, DETAILS_CACHE_DB)
+            write(db_path, lambda con: con.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, version)))
+            totals["shards"] += 1
+    metrics.inc("shards_merged_total", totals["shards"])
+    return totals
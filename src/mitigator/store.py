@@ -1,11 +1,17 @@
-import sqlite3, csv
-from pathlib import Path
-from typing import Dict, Any
-from mitigator.dedupe import entity_key, merge_rows
+import sqlite3, uuid
+from typing import Dict, Any, Callable, Iterable, Optional
+from mitigator import metrics
+from mitigator.db import connect, write
+from mitigator.dedupe import UnionFind, entity_keys, merge_rows
+from mitigator.export import export
+from mitigator.normalize import extract_city_state, norm_categories
+
+KEY_FORMAT = "2"  # bump whenever entity_keys() output changes; db_init then rebuilds the index (2: no NANP "1")
 
 def db_init(db_path: str):
-    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-    con = sqlite3.connect(db_path)
+    # own connection, not the writer thread: the DDL below uses executescript, which commits by itself,
+    # and this runs once at startup, before any other writes
+    con = connect(db_path)  # also switches the file to WAL
     cur = con.cursor()
     cur.execute("""
     CREATE TABLE IF NOT EXISTS companies (
@@ -21,58 +27,396 @@ def db_init(db_path: str):
         email TEXT,                -- NEW
         email_source TEXT,         -- NEW: website|whois|guess+smtp|third_party
         email_confidence REAL,     -- NEW: 0..1
-        email_last_seen TEXT       -- NEW: YYYY-MM-DD
+        email_last_seen TEXT,      -- NEW: YYYY-MM-DD
+        email_checked TEXT,        -- YYYY-MM-DD of the last website scan, found or not
+        change_seq INTEGER,        -- bumped when a row is added or its last_seen/score changes
+        city TEXT, state TEXT,     -- derived at write time (see derived())
+        category_list TEXT,        -- normalized, sorted categories (indexed by companies_fts)
+        has_email INTEGER
     );
     """)
-    # Add entity_key if it was missing (older DBs)
+    # Add columns missing from older DBs
     cols = {c[1] for c in cur.execute("PRAGMA table_info(companies)").fetchall()}
     if "entity_key" not in cols:
         cur.execute("ALTER TABLE companies ADD COLUMN entity_key TEXT;")
+    if "email_checked" not in cols:
+        cur.execute("ALTER TABLE companies ADD COLUMN email_checked TEXT;")
+    if "change_seq" not in cols:
+        cur.execute("ALTER TABLE companies ADD COLUMN change_seq INTEGER;")
+        cur.execute("UPDATE companies SET change_seq = id")
+    missing = [col for col in DERIVED_COLS if col not in cols]
+    if missing:
+        for col in missing:
+            cur.execute(f"ALTER TABLE companies ADD COLUMN {col} {'INTEGER' if col == 'has_email' else 'TEXT'};")
+        cur.executemany(f"UPDATE companies SET {', '.join(f'{c} = ?' for c in DERIVED_COLS)} WHERE id = ?",
+                        [(*derived({"address": a, "categories": c, "email": e}).values(), cid)
+                         for cid, a, c, e in cur.execute("SELECT id, address, categories, email FROM companies").fetchall()])
+    cur.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    cur.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', '0')")
+    # identifies this DB file for its lifetime (a re-created shard gets a new one; see shard.merge_shards)
+    cur.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('db_id', ?)", (uuid.uuid4().hex,))
     # Unique index for dedupe
     cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_entity_key ON companies(entity_key)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_source ON companies(source, source_id)")
-    con.commit(); con.close()
+    # Dashboard sort/filter columns
+    for col in ("score", "rating", "review_count", "name", "has_email"):
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{col} ON companies({col})")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_city_state ON companies(city, state)")
+    # Every normalized key (phone, domain, name+place) -> the company row its cluster lives in
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS entity_keys (
+        key TEXT PRIMARY KEY,
+        company_id INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_entity_keys_company ON entity_keys(company_id)")
+    _fts_init(cur)
+    _geo_init(cur)
+    _change_seq_init(cur)
+    _stats_init(cur)
+    has_rows = cur.execute("SELECT 1 FROM companies LIMIT 1").fetchone() is not None
+    fmt = cur.execute("SELECT value FROM meta WHERE key = 'key_format'").fetchone()
+    if not has_rows:
+        cur.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('key_format', ?)", (KEY_FORMAT,))
+    con.commit()
+    rekey = has_rows and (fmt is None or fmt[0] != KEY_FORMAT
+                          or cur.execute("SELECT 1 FROM entity_keys LIMIT 1").fetchone() is None)
+    con.close()
+    if rekey:
+        rebuild_entity_index(db_path)
+
+FTS_COLS = ("name", "address", "website", "category_list")
+
+def _fts_init(cur):
+    """Full-text index over FTS_COLS, kept in sync with companies by triggers."""
+    exists = cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'companies_fts'").fetchone()
+    if exists and tuple(c[1] for c in cur.execute("PRAGMA table_info(companies_fts)")) != FTS_COLS:
+        # indexed other columns (earlier versions: raw categories); recreate it and its triggers
+        cur.executescript("""
+        DROP TRIGGER IF EXISTS companies_fts_ai; DROP TRIGGER IF EXISTS companies_fts_ad;
+        DROP TRIGGER IF EXISTS companies_fts_au; DROP TABLE companies_fts;
+        """)
+        exists = None
+    cols = ", ".join(FTS_COLS)
+    new_vals = ", ".join(f"new.{c}" for c in FTS_COLS)
+    old_vals = ", ".join(f"old.{c}" for c in FTS_COLS)
+    changed = " OR ".join(f"old.{c} IS NOT new.{c}" for c in FTS_COLS)
+    cur.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS companies_fts USING fts5({cols}, content='companies', content_rowid='id')")
+    cur.executescript(f"""
+    CREATE TRIGGER IF NOT EXISTS companies_fts_ai AFTER INSERT ON companies BEGIN
+        INSERT INTO companies_fts(rowid, {cols}) VALUES (new.id, {new_vals});
+    END;
+    CREATE TRIGGER IF NOT EXISTS companies_fts_ad AFTER DELETE ON companies BEGIN
+        INSERT INTO companies_fts(companies_fts, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+    END;
+    CREATE TRIGGER IF NOT EXISTS companies_fts_au AFTER UPDATE OF {cols} ON companies WHEN {changed} BEGIN
+        INSERT INTO companies_fts(companies_fts, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+        INSERT INTO companies_fts(rowid, {cols}) VALUES (new.id, {new_vals});
+    END;
+    """)
+    if not exists:
+        cur.execute("INSERT INTO companies_fts(companies_fts) VALUES ('rebuild')")
+
+def _geo_init(cur):
+    """R*Tree over lat/lng (a point per company), kept in sync with companies by triggers."""
+    exists = cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'companies_geo'").fetchone()
+    cur.execute("CREATE VIRTUAL TABLE IF NOT EXISTS companies_geo USING rtree(id, min_lat, max_lat, min_lng, max_lng)")
+    cur.executescript("""
+    CREATE TRIGGER IF NOT EXISTS companies_geo_ai AFTER INSERT ON companies
+    WHEN new.lat IS NOT NULL AND new.lng IS NOT NULL BEGIN
+        INSERT OR REPLACE INTO companies_geo VALUES (new.id, new.lat, new.lat, new.lng, new.lng);
+    END;
+    CREATE TRIGGER IF NOT EXISTS companies_geo_ad AFTER DELETE ON companies BEGIN
+        DELETE FROM companies_geo WHERE id = old.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS companies_geo_au AFTER UPDATE OF lat, lng ON companies
+    WHEN old.lat IS NOT new.lat OR old.lng IS NOT new.lng BEGIN
+        DELETE FROM companies_geo WHERE id = old.id;
+        INSERT INTO companies_geo SELECT new.id, new.lat, new.lat, new.lng, new.lng
+        WHERE new.lat IS NOT NULL AND new.lng IS NOT NULL;
+    END;
+    """)
+    if not exists:
+        cur.execute("""INSERT INTO companies_geo SELECT id, lat, lat, lng, lng FROM companies
+                       WHERE lat IS NOT NULL AND lng IS NOT NULL""")
+
+def _change_seq_init(cur):
+    """Stamp new rows and last_seen/score changes with the next change_seq (drives incremental export)."""
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_change_seq ON companies(change_seq)")
+    bump = "UPDATE companies SET change_seq = (SELECT COALESCE(MAX(change_seq), 0) + 1 FROM companies) WHERE id = new.id;"
+    cur.executescript(f"""
+    CREATE TRIGGER IF NOT EXISTS companies_seq_ai AFTER INSERT ON companies BEGIN
+        {bump}
+    END;
+    CREATE TRIGGER IF NOT EXISTS companies_seq_au AFTER UPDATE OF last_seen, score ON companies
+    WHEN old.last_seen IS NOT new.last_seen OR old.score IS NOT new.score BEGIN
+        {bump}
+    END;
+    """)
+
+def _stats_init(cur):
+    """
+    company_stats: per (city, state, has_email) counts and sums for the dashboard's
+    summary tiles, kept current by triggers; every write to companies also bumps
+    meta.data_version so readers can tell when to reload.
+    """
+    exists = cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'company_stats'").fetchone()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS company_stats (
+        city TEXT NOT NULL, state TEXT NOT NULL, has_email INTEGER NOT NULL,  -- '' / 0 when unknown
+        companies INTEGER NOT NULL, score_sum REAL NOT NULL, rating_sum REAL NOT NULL, reviews_sum INTEGER NOT NULL,
+        PRIMARY KEY (city, state, has_email)
+    ) WITHOUT ROWID;
+    """)
+    def add(r: str, sign: str) -> str:
+        return f"""INSERT INTO company_stats VALUES (COALESCE({r}.city, ''), COALESCE({r}.state, ''), COALESCE({r}.has_email, 0),
+                       {sign}1, {sign}COALESCE({r}.score, 0), {sign}COALESCE({r}.rating, 0), {sign}COALESCE({r}.review_count, 0))
+                   ON CONFLICT (city, state, has_email) DO UPDATE SET companies = companies + excluded.companies,
+                       score_sum = score_sum + excluded.score_sum, rating_sum = rating_sum + excluded.rating_sum,
+                       reviews_sum = reviews_sum + excluded.reviews_sum;"""
+    bump = "UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'data_version';"
+    cur.executescript(f"""
+    CREATE TRIGGER IF NOT EXISTS companies_stats_ai AFTER INSERT ON companies BEGIN
+        {add("new", "")}
+    END;
+    CREATE TRIGGER IF NOT EXISTS companies_stats_ad AFTER DELETE ON companies BEGIN
+        {add("old", "-")}
+    END;
+    CREATE TRIGGER IF NOT EXISTS companies_stats_au AFTER UPDATE OF city, state, has_email, score, rating, review_count ON companies BEGIN
+        {add("old", "-")}
+        {add("new", "")}
+    END;
+    CREATE TRIGGER IF NOT EXISTS companies_version_ai AFTER INSERT ON companies BEGIN {bump} END;
+    CREATE TRIGGER IF NOT EXISTS companies_version_ad AFTER DELETE ON companies BEGIN {bump} END;
+    CREATE TRIGGER IF NOT EXISTS companies_version_au AFTER UPDATE ON companies BEGIN {bump} END;
+    """)
+    if not exists:
+        cur.execute("""INSERT INTO company_stats
+                        SELECT COALESCE(city, ''), COALESCE(state, ''), COALESCE(has_email, 0), COUNT(*),
+                               SUM(COALESCE(score, 0)), SUM(COALESCE(rating, 0)), SUM(COALESCE(review_count, 0))
+                        FROM companies GROUP BY 1, 2, 3""")
+
+DERIVED_COLS = ("city", "state", "category_list", "has_email")
+
+def derived(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Columns computed from a row whenever it is written (dashboard filters, company_stats)."""
+    city, state = extract_city_state(row.get("address"))
+    return {"city": city.title() if city else None, "state": state,
+            "category_list": norm_categories(row.get("categories")), "has_email": int(bool(row.get("email")))}
+
+BATCH = 500  # max bound parameters per IN (...) lookup
 
 def upsert_company(db_path: str, row: Dict[str, Any]):
-    ek = entity_key(row)
-    if not ek:
-        # fallback: insert as-is; no key -> cannot upsert
-        _insert(db_path, row | {"entity_key": None})
-        return
-
-    con = sqlite3.connect(db_path); cur = con.cursor()
-    cur.execute("SELECT rowid, * FROM companies WHERE entity_key = ?", (ek,))
-    hit = cur.fetchone()
-    if not hit:
-        _insert(db_path, row | {"entity_key": ek}, con, cur)
-        con.commit(); con.close(); return
-
-    # Build dict from existing row (column order from PRAGMA)
-    cols = [c[1] for c in cur.execute("PRAGMA table_info(companies)").fetchall()]
-    existing = dict(zip(cols, hit[1:]))  # skip rowid
-    merged = merge_rows(existing, row | {"entity_key": ek})
-
-    # Update merged fields
-    sets = ", ".join([f"{k}=?" for k in merged.keys()])
-    vals = list(merged.values()) + [existing["id"]]
-    cur.execute(f"UPDATE companies SET {sets} WHERE id = ?", vals)
-    con.commit(); con.close()
-
-def _insert(db_path: str, row: Dict[str, Any], con=None, cur=None):
-    owned = False
-    if con is None:
-        con = sqlite3.connect(db_path); cur = con.cursor(); owned = True
-    cols = ",".join(row.keys())
-    qmarks = ",".join(["?"] * len(row))
-    cur.execute(f"INSERT OR IGNORE INTO companies ({cols}) VALUES ({qmarks})", list(row.values())) # type: ignore
-    if owned:
-        con.commit(); con.close()
-
-def export_csv(db_path: str, csv_out: str):
-    con = sqlite3.connect(db_path); cur = con.cursor()
-    cols = [c[1] for c in cur.execute("PRAGMA table_info(companies);").fetchall()]
-    rows = cur.execute("SELECT * FROM companies").fetchall()
-    Path(csv_out).parent.mkdir(parents=True, exist_ok=True)
-    with open(csv_out, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f); w.writerow(cols); w.writerows(rows)
-    con.close()
+    upsert_companies(db_path, [row])
+
+def upsert_companies(db_path: str, rows: Iterable[Dict[str, Any]],
+                     in_tx: Optional[Callable[[sqlite3.Cursor], None]] = None) -> Dict[str, int]:
+    """
+    Upsert many rows in one connection/transaction; returns inserted/merged/collapsed/skipped
+    counts. in_tx(cur) runs inside the same transaction (e.g. journaling where the rows came from).
+    """
+    def tx(con):
+        cur = con.cursor()
+        stats = _upsert_rows(cur, rows)
+        if in_tx is not None:
+            in_tx(cur)
+        return stats
+    with metrics.stage("upsert"):
+        stats = write(db_path, tx)
+    for result, n in stats.items():
+        metrics.inc("rows_total", n, result=result)
+    return stats
+
+def _columns(cur) -> list[str]:
+    return [c[1] for c in cur.execute("PRAGMA table_info(companies)").fetchall()]
+
+def _in(n: int) -> str:
+    return ",".join("?" * n)
+
+def _select_in(cur, sql: str, values: list) -> list:
+    """Run `sql` (with one {qs} placeholder list) over values in BATCH-sized chunks."""
+    out = []
+    for i in range(0, len(values), BATCH):
+        chunk = values[i:i+BATCH]
+        out.extend(cur.execute(sql.format(qs=_in(len(chunk))), chunk).fetchall())
+    return out
+
+def _upsert_rows(cur, rows: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    cols = _columns(cur)
+    batch: list[tuple[list[str], Dict[str, Any]]] = []
+    loose: list[Dict[str, Any]] = []
+    for row in rows:
+        keys = getattr(row, "ekeys", None) or entity_keys(row)  # Records arrive with keys precomputed
+        if keys:
+            batch.append((keys, {**row, "entity_key": keys[0]}))
+        else:
+            # no key -> cannot upsert, insert as-is
+            loose.append({**row, "entity_key": None})
+
+    # Resolve every key already indexed with a handful of IN (...) lookups
+    all_keys = list({k for keys, _ in batch for k in keys})
+    known = dict(_select_in(cur, "SELECT key, company_id FROM entity_keys WHERE key IN ({qs})", all_keys))
+    # A company can still hold a key in its entity_key column without owning it in entity_keys
+    # (update_contacts leaves the column alone when another row has the new value); a new row
+    # with that key would be ignored by the insert below, so the column counts as an owner too.
+    for k, cid in _select_in(cur, "SELECT entity_key, id FROM companies WHERE entity_key IN ({qs})", all_keys):
+        known.setdefault(k, cid)
+
+    # Union-find over existing clusters and incoming rows: any shared key links them
+    uf = UnionFind()
+    for i, (keys, _) in enumerate(batch):
+        uf.find(("r", i))
+        for k in keys:
+            uf.union(("r", i), ("k", k))
+            if k in known:
+                uf.union(("k", k), ("c", known[k]))
+    comps: Dict[Any, list] = {}
+    for node in uf.parent:
+        if node[0] != "k":
+            comps.setdefault(uf.find(node), []).append(node)
+
+    cids = sorted({c for c in known.values()})
+    existing = {r[0]: dict(zip(cols, r)) for r in _select_in(cur, "SELECT * FROM companies WHERE id IN ({qs})", cids)}
+
+    new, merged, collapsed, losers = [], [], 0, []
+    comp_keys: list[tuple[Any, list[str]]] = []
+    for nodes in comps.values():
+        ids = sorted(n[1] for n in nodes if n[0] == "c" and n[1] in existing)
+        idx = sorted(n[1] for n in nodes if n[0] == "r")
+        keys = [k for i in idx for k in batch[i][0]]
+        if ids:
+            # fold arrival order into the oldest row, collapsing any other clusters it bridges
+            rec = existing[ids[0]]
+            for other in ids[1:]:
+                rec = merge_rows(rec, existing[other])
+            for i in idx:
+                rec = merge_rows(rec, batch[i][1])
+            merged.append(rec)
+            losers.extend((ids[0], other) for other in ids[1:])
+            collapsed += len(ids) - 1
+            comp_keys.append((ids[0], keys))
+        else:
+            rec = batch[idx[0]][1]
+            for i in idx[1:]:
+                rec = merge_rows(rec, batch[i][1])
+            new.append(rec)
+            comp_keys.append((rec["entity_key"], keys))
+
+    for rec in new + merged + loose:
+        rec.update(derived(rec))
+    if losers:
+        cur.executemany("DELETE FROM companies WHERE id = ?", [(o,) for _, o in losers])
+        cur.executemany("UPDATE entity_keys SET company_id = ? WHERE company_id = ?", losers)
+    inserted = _write_many(cur, "INSERT OR IGNORE INTO companies ({cols}) VALUES ({qmarks})", new + loose)
+    _write_many(cur, "UPDATE companies SET {sets} WHERE id = ?", merged, by_id=True)
+
+    # new rows only got ids on insert; map their entity_key back to an id
+    new_ids = dict(_select_in(cur, "SELECT entity_key, id FROM companies WHERE entity_key IN ({qs})",
+                              [r["entity_key"] for r in new]))
+    cur.executemany("INSERT OR REPLACE INTO entity_keys (key, company_id) VALUES (?, ?)",
+                    [(k, cid) for ref, keys in comp_keys
+                     for cid in [ref if isinstance(ref, int) else new_ids.get(ref)] if cid is not None
+                     for k in keys])
+    return {"inserted": inserted, "merged": len(merged), "collapsed": collapsed,
+            "skipped": len(new) + len(loose) - inserted}
+
+def _write_many(cur, template: str, rows: list[Dict[str, Any]], by_id: bool = False) -> int:
+    # executemany needs one statement per column set, so group rows by their keys
+    written = 0
+    groups: Dict[tuple, list] = {}
+    for r in rows:
+        groups.setdefault(tuple(r.keys()), []).append(r)
+    for keys, group in groups.items():
+        sql = template.format(cols=",".join(keys), qmarks=_in(len(keys)),
+                              sets=", ".join(f"{k}=?" for k in keys))
+        if by_id:
+            cur.executemany(sql, [list(r.values()) + [r["id"]] for r in group])
+        else:
+            cur.executemany(sql, [list(r.values()) for r in group])
+        written += cur.rowcount
+    return written
+
+def merge_companies(db_path: str, groups: Iterable[Iterable[int]]) -> int:
+    """Collapse each group of company ids into its lowest id via merge_rows; returns rows removed."""
+    return write(db_path, lambda con: _merge_groups(con.cursor(), groups))
+
+def _merge_groups(cur, groups: Iterable[Iterable[int]]) -> int:
+    cols = _columns(cur)
+    removed = 0
+    for group in groups:
+        ids = sorted(set(group))
+        if len(ids) < 2:
+            continue
+        recs = [dict(zip(cols, r)) for r in
+                cur.execute(f"SELECT * FROM companies WHERE id IN ({_in(len(ids))}) ORDER BY id", ids)]
+        if len(recs) < 2:
+            continue
+        root = recs[0]
+        for other in recs[1:]:
+            root = merge_rows(root, other)
+        root.update(derived(root))
+        others = [r["id"] for r in recs[1:]]
+        cur.execute(f"DELETE FROM companies WHERE id IN ({_in(len(others))})", others)
+        cur.execute(f"UPDATE entity_keys SET company_id = ? WHERE company_id IN ({_in(len(others))})",
+                    [root["id"]] + others)
+        _write_many(cur, "UPDATE companies SET {sets} WHERE id = ?", [root], by_id=True)
+        cur.executemany("INSERT OR IGNORE INTO entity_keys (key, company_id) VALUES (?, ?)",
+                        [(k, root["id"]) for k in entity_keys(root)])
+        removed += len(others)
+    return removed
+
+def update_contacts(db_path: str, updates: Iterable[tuple]) -> Dict[str, int]:
+    """
+    Apply refreshed (phone, website, id) values (None keeps the current one) in one
+    transaction that keeps entity_keys in step: keys only the old values produced are
+    dropped, the new ones indexed, and a company whose new key another company already
+    owns is merged with it. Returns updated/collapsed counts.
+    """
+    def tx(con):
+        cur = con.cursor()
+        cols = _columns(cur)
+        updated = collapsed = 0
+        for phone, website, cid in updates:
+            row = cur.execute("SELECT * FROM companies WHERE id = ?", (cid,)).fetchone()
+            if row is None:  # merged away earlier in this batch
+                continue
+            old = dict(zip(cols, row))
+            new = {**old, "phone": phone or old["phone"], "website": website or old["website"]}
+            keys = entity_keys(new)
+            cur.executemany("DELETE FROM entity_keys WHERE key = ? AND company_id = ?",
+                            [(k, cid) for k in set(entity_keys(old)) - set(keys)])
+            cur.execute("UPDATE companies SET phone = ?, website = ? WHERE id = ?", (new["phone"], new["website"], cid))
+            cur.executemany("INSERT OR IGNORE INTO entity_keys (key, company_id) VALUES (?, ?)", [(k, cid) for k in keys])
+            owners = {c for _, c in _select_in(cur, "SELECT key, company_id FROM entity_keys WHERE key IN ({qs})", keys)}
+            collapsed += _merge_groups(cur, [owners | {cid}])
+            if keys:  # so a new row with the old primary key is not taken for this one (uq_entity_key)
+                cur.execute("UPDATE OR IGNORE companies SET entity_key = ? WHERE id = ?", (keys[0], cid))
+            updated += 1
+        return {"updated": updated, "collapsed": collapsed}
+    return write(db_path, tx)
+
+def rebuild_entity_index(db_path: str) -> int:
+    """Recompute entity_keys from companies, merging rows that already share a key; returns rows merged."""
+    uf = UnionFind()
+    owner: Dict[str, int] = {}
+    def tx(con):
+        for cid, name, phone, website, address in con.execute("SELECT id, name, phone, website, address FROM companies"):
+            uf.find(cid)
+            for k in entity_keys({"name": name, "phone": phone, "website": website, "address": address}):
+                if k in owner:
+                    uf.union(owner[k], cid)
+                else:
+                    owner[k] = cid
+        con.execute("DELETE FROM entity_keys")
+        con.executemany("INSERT INTO entity_keys (key, company_id) VALUES (?, ?)",
+                        [(k, uf.find(cid)) for k, cid in owner.items()])
+        con.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('key_format', ?)", (KEY_FORMAT,))
+        return _merge_groups(con.cursor(), [g for g in uf.groups().values() if len(g) > 1])
+    return write(db_path, tx)
+
+def update_scores(db_path: str, rows: Iterable[Dict[str, Any]]):
+    write(db_path, lambda con: con.executemany("UPDATE companies SET score=? WHERE source=? AND source_id=?",
+                                                [(r["score"], r["source"], r["source_id"]) for r in rows]))
+
+def export_csv(db_path: str, csv_out: str) -> int:
+    return export(db_path, csv_out, fmt="csv")
@@ -1,108 +1,97 @@
 # Streamlit viewer for mitigation.db
 # Run:  streamlit run app.py
 
-import os
-from pathlib import Path
+import io, csv, os
 import pandas as pd
 import streamlit as st
+from mitigator.geo import haversine_miles
+from mitigator.query import VIEW_COLS, data_version, distinct_cities, fetch_page, iter_rows, summary
 
 DB_PATH = os.getenv("DB_PATH", "src/data/mitigation.db")
-TABLE = "companies"
 
 st.set_page_config(page_title="Mitigation Companies", layout="wide")
 
-@st.cache_data(show_spinner=False)
-def load_df(db_path: str) -> pd.DataFrame:
-    if not Path(db_path).exists():
-        raise FileNotFoundError(f"DB not found: {db_path}")
-    # Works with sqlite:/// relative paths
-    return pd.read_sql(f"SELECT * FROM {TABLE}", f"sqlite:///{db_path}")
+# Cached reads are keyed on the DB's data_version: any write to companies invalidates
+# them on the next rerun, and unchanged data is never re-read.
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_cities(db_path: str, version: int) -> list[str]:
+    return distinct_cities(db_path)
 
-def coalesce_text(x):
-    return x if isinstance(x, str) else ""
+@st.cache_data(show_spinner=False, max_entries=256)
+def load_summary(db_path: str, version: int, filters: dict) -> dict:
+    return summary(db_path, filters)
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def load_page(db_path: str, version: int, filters: dict, sort_by: str, ascending: bool,
+              limit: int, offset: int, columns: tuple) -> list:
+    return fetch_page(db_path, filters, sort_by, ascending, limit, offset, columns)
+
+def filtered_csv(db_path: str, filters: dict, sort_by: str, ascending: bool) -> bytes:
+    buf = io.StringIO()
+    w = csv.writer(buf); w.writerow(VIEW_COLS)
+    w.writerows(iter_rows(db_path, filters, sort_by, ascending))
+    return buf.getvalue().encode("utf-8")
 
 def main():
     st.title("Mitigation Companies")
 
     try:
-        df = load_df(DB_PATH)
+        version = data_version(DB_PATH)
+        cities = load_cities(DB_PATH, version)
     except Exception as e:
         st.error(str(e))
         st.stop()
 
-    # Quick derived fields
-    df["city"] = df["address"].fillna("").str.extract(r",\s*([^,]+),\s*[A-Z]{2}", expand=False)
-    df["state"] = df["address"].fillna("").str.extract(r",\s*([A-Z]{2})\s*\d{0,5}$", expand=False)
-    df["categories"] = df["categories"].apply(coalesce_text)
-
     with st.sidebar:
         st.header("Filters")
         text_query = st.text_input("Search (name/address/website)")
         category_q = st.text_input("Category contains", placeholder="mold, fire, water…")
-        cities = sorted([c for c in df["city"].dropna().unique() if c])
         city_sel = st.multiselect("City", options=cities)
         contains_email = st.checkbox("Only Contains Email", value=False)
         min_score = st.number_input("Min score", min_value=0.0, max_value=10.0, value=0.0, step=0.1)
-        max_reviews = st.number_input("Max reviews", min_value=0, value=1000, step=50)
+        max_reviews = st.number_input("Max reviews (0 = any)", min_value=0, value=0, step=50)
         min_reviews = st.number_input("Min reviews", min_value=0, value=0, step=1)
-        sort_by = st.selectbox("Sort by", options=["score","rating","review_count","name"])
+        near_on = st.checkbox("Within distance", value=False)
+        if near_on:
+            c_lat = st.number_input("Center lat", value=47.6062, format="%.4f")
+            c_lng = st.number_input("Center lng", value=-122.3321, format="%.4f")
+            radius = st.slider("Radius (miles)", 1, 200, 25)
+        sort_by = st.selectbox("Sort by", options=["score","rating","review_count","name","relevance","distance"])
         ascending = st.checkbox("Ascending", value=False)
         top_n = st.slider("Rows to show", 10, 1000, 200, step=10)
-        st.markdown("---")
-        if st.button("Reload data (clear cache)"):
-            load_df.clear()  # type: ignore
-            st.experimental_rerun() # type: ignore
-
-    # Apply filters
-    view = df.copy()
-    print(df)
-    if text_query:
-        tq = text_query.lower()
-        mask = (
-            view["name"].fillna("").str.lower().str.contains(tq) |
-            view["address"].fillna("").str.lower().str.contains(tq) |
-            view["website"].fillna("").str.lower().str.contains(tq)
-        )
-        view = view[mask]
-
-    if category_q:
-        for token in [t.strip() for t in category_q.split(",") if t.strip()]:
-            view = view[view["categories"].str.contains(token, case=False, na=False)]
-
-    if city_sel:
-        view = view[view["city"].isin(city_sel)]
-
-    if min_score:
-        view = view[(view["score"].fillna(0) >= float(min_score))]
-    if max_reviews:
-        view = view[(view["review_count"].fillna(0) <= int(max_reviews))]
-    if min_reviews:
-        view = view[(view["review_count"].fillna(0) >= int(min_reviews))]
-
-    # Sort + show
-    if sort_by not in view.columns:
-        sort_by = "score"
-    view = view.sort_values(by=sort_by, ascending=ascending)
-    if contains_email:
-        view = view[view["email"].notna()]
+        page = st.number_input("Page", min_value=1, value=1, step=1)
+
+    # Filters run in SQL; only the visible page comes back
+    filters = {
+        "text": text_query,
+        "categories": [t.strip() for t in category_q.split(",") if t.strip()],
+        "cities": city_sel,
+        "min_score": min_score,
+        "min_reviews": min_reviews,
+        "max_reviews": max_reviews,
+        "has_email": contains_email,
+        "near": (c_lat, c_lng, radius) if near_on else None,
+    }
 
     # Summary tiles
+    s = load_summary(DB_PATH, version, filters)
     k1, k2, k3, k4 = st.columns(4)
-    with k1: st.metric("Companies", len(view))
-    with k2: st.metric("Avg score", round(view["score"].fillna(0).mean(), 3))
-    with k3: st.metric("Avg rating", round(view["rating"].fillna(0).mean(), 3))
-    with k4: st.metric("Total reviews", int(view["review_count"].fillna(0).sum()))
-
-    st.dataframe(
-        view.head(top_n)[[
-            "name","score","rating","review_count","address","categories","website","phone", "email"
-        ]],
-        use_container_width=True,
-    )
-
-    # Download current view
-    csv = view.to_csv(index=False).encode("utf-8")
-    st.download_button("Download filtered CSV", data=csv, file_name="companies_filtered.csv", mime="text/csv")
+    with k1: st.metric("Companies", s["companies"])
+    with k2: st.metric("Avg score", round(s["avg_score"], 3))
+    with k3: st.metric("Avg rating", round(s["avg_rating"], 3))
+    with k4: st.metric("Total reviews", int(s["total_reviews"]))
+
+    cols = (*VIEW_COLS, "lat", "lng")
+    rows = load_page(DB_PATH, version, filters, sort_by, ascending, top_n, (int(page) - 1) * top_n, cols)
+    view = pd.DataFrame(rows, columns=cols)
+    if near_on:
+        view.insert(1, "miles", [round(haversine_miles(c_lat, c_lng, a, b), 1) for a, b in zip(view["lat"], view["lng"])])
+    st.dataframe(view.drop(columns=["lat", "lng"]), use_container_width=True)
+
+    # Download current view (all pages); built on demand so reruns stay cheap
+    if st.button("Prepare filtered CSV"):
+        st.download_button("Download filtered CSV", data=filtered_csv(DB_PATH, filters, sort_by, ascending),
+                           file_name="companies_filtered.csv", mime="text/csv")
 
 if __name__ == "__main__":
     main()
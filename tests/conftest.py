@@ -0,0 +1,8 @@
+import pytest
+from mitigator.store import db_init
+
+@pytest.fixture
+def db(tmp_path) -> str:
+    path = str(tmp_path / "mitigation.db")
+    db_init(path)
+    return path
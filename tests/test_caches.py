@@ -0,0 +1,34 @@
+from mitigator.collect.details_cache import DetailsCache
+from mitigator.db import reader
+from mitigator.page_cache import PageCache
+
+def cached_ids(db):
+    with reader(db) as con:
+        return {p for (p,) in con.execute("SELECT place_id FROM place_details_cache")}
+
+def test_details_cache_writes_behind_and_persists(db):
+    cache = DetailsCache(db)
+    cache.put("P1", {"phone": "2065550101", "website": "alpha.com"})
+    assert cache.get("P1") == {"phone": "2065550101", "website": "alpha.com"}  # served from memory
+    cache.flush()
+    assert cached_ids(db) == {"P1"}
+    cache.close()
+    assert DetailsCache(db).get("P1") == {"phone": "2065550101", "website": "alpha.com"}
+
+def test_details_cache_evicts_beyond_max_entries(db):
+    cache = DetailsCache(db, max_entries=2)
+    for i in range(3):
+        cache.put(f"P{i}", {"phone": str(i)})
+    cache.close()
+    DetailsCache(db, max_entries=2).close()  # sweeps on open
+    assert len(cached_ids(db)) == 2
+
+def test_page_cache_round_trip(db):
+    pages = PageCache(db)
+    pages.put("http://a.com/", "a.com", '"v1"', None, "h1", {"info@a.com"}, set())
+    pages.put_missing("http://a.com/contact", "a.com")
+    pages.flush()
+    assert pages.get("http://a.com/")["emails"] == {"info@a.com"}
+    assert pages.get("http://a.com/contact") is None
+    assert pages.missing("a.com") == {"http://a.com/contact"}
+    pages.close()
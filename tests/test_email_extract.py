@@ -0,0 +1,28 @@
+import io
+import requests
+from mitigator.email_extract import emails_from_html, stream_text
+
+def response(body: bytes, content_type: str) -> requests.Response:
+    r = requests.Response()
+    r.status_code, r.raw = 200, io.BytesIO(body)
+    r.headers["Content-Type"] = content_type
+    r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+    return r
+
+def text(r, **kw) -> str:
+    return "".join(stream_text(r, **kw))
+
+def test_unknown_charset_falls_back_to_utf8():
+    r = response("<p>Café: info@cafe-dry.com</p>".encode(), "text/html; charset=utf8mb4")
+    assert text(r) == "<p>Café: info@cafe-dry.com</p>"
+
+def test_declared_charset_is_used():
+    r = response("<p>Café</p>".encode("latin-1"), "text/html; charset=iso-8859-1")
+    assert text(r) == "<p>Café</p>"
+
+def test_non_html_yields_nothing():
+    assert text(response(b"%PDF info@x.com", "application/pdf")) == ""
+
+def test_address_split_across_chunks_is_found():
+    body = b"<p>" + b"x" * (16 * 1024 - 8) + b" office@alpha-dry.com</p>"
+    assert emails_from_html(text(response(body, "text/html"))) == {"office@alpha-dry.com"}
@@ -0,0 +1,35 @@
+from mitigator.fuzzy import corroborated, fuzzy_clusters
+
+SEATTLE, BELLEVUE = (47.6062, -122.3321), (47.6101, -122.2015)
+
+def rec(name, phone=None, website=None, at=None, address="Seattle, WA"):
+    lat, lng = at or (None, None)
+    return {"name": name, "phone": phone, "website": website, "lat": lat, "lng": lng, "address": f"1 Main St, {address}"}
+
+def test_subset_name_with_other_phone_far_away_is_not_merged():
+    # token_set_ratio used to score these 100, and the phones shared a 6-digit prefix block
+    recs = [rec("Water Damage Pros", "206-555-1234", at=SEATTLE),
+            rec("Seattle Water Damage Pros", "206-555-9876", at=(47.6062 + 0.126, -122.3321))]  # ~14 km north
+    assert fuzzy_clusters(recs) == []
+
+def test_franchises_sharing_a_name_are_not_merged():
+    recs = [rec("Paul Davis Restoration", "206-555-0100", at=SEATTLE),
+            rec("Paul Davis Restoration", "425-555-0200", at=BELLEVUE),
+            rec("Paul Davis Restoration of Seattle", "206-555-0300")]
+    assert fuzzy_clusters(recs) == []
+
+def test_same_name_with_a_second_signal_is_merged():
+    recs = [rec("SERVPRO of Bellevue", "425-555-0100", at=BELLEVUE),
+            rec("Servpro Bellevue", "425-555-0199", at=(47.6102, -122.2016)),                # ~15 m away
+            rec("Servpro of Bellevue", website="https://servprobellevue.com"),
+            rec("ServPro Bellevue LLC", "(425) 555-0777", website="servprobellevue.com/contact")]
+    assert fuzzy_clusters(recs) == [[0, 1], [2, 3]]
+
+def test_similar_name_is_still_required():
+    recs = [rec("Alpha Dry", "206-555-0100", at=SEATTLE), rec("Bravo Mold", "206-555-0100", at=SEATTLE)]
+    assert fuzzy_clusters(recs) == []
+
+def test_corroborated_ignores_shared_listing_domains():
+    a = rec("Alpha", website="https://www.yelp.com/biz/alpha")
+    b = rec("Alpha", website="https://www.yelp.com/biz/alpha-2")
+    assert not corroborated(a, b)
@@ -0,0 +1,41 @@
+import pytest
+from mitigator.collect import google_collect
+from mitigator.collect.details_cache import DetailsCache
+from mitigator.collect.google_collect import GoogleApiError, google_place_details, google_text_search_pages
+
+class Reply:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+@pytest.fixture
+def replies(monkeypatch):
+    """Serve the given JSON bodies, in order, to google_collect's HTTP calls."""
+    bodies = []
+    monkeypatch.setattr(google_collect.net, "get", lambda *a, **kw: Reply(bodies.pop(0)))
+    return bodies
+
+@pytest.mark.parametrize("status", ["OVER_QUERY_LIMIT", "REQUEST_DENIED", "UNKNOWN_ERROR"])
+def test_text_search_error_status_raises_instead_of_an_empty_page(replies, status):
+    replies.append({"status": status, "results": []})
+    with pytest.raises(GoogleApiError):
+        list(google_text_search_pages("k", "water damage", "Seattle, WA", enrich_details=False))
+
+def test_text_search_zero_results_is_a_last_page(replies):
+    replies.append({"status": "ZERO_RESULTS", "results": []})
+    assert list(google_text_search_pages("k", "water damage", "Seattle, WA", enrich_details=False)) == [(0, [], None)]
+
+def test_details_error_status_is_not_cached(replies, db):
+    cache = DetailsCache(db)
+    replies += [{"status": "OVER_QUERY_LIMIT"},
+                {"status": "OK", "result": {"formatted_phone_number": "(206) 555-0101", "website": "http://a.com"}}]
+    assert google_place_details("k", "P1", cache=cache) == {"phone": None, "website": None}
+    assert cache.get("P1") is None  # the quota blip is retried, not remembered for the TTL
+    assert google_place_details("k", "P1", cache=cache) == {"phone": "(206) 555-0101", "website": "http://a.com"}
+    assert cache.get("P1") == {"phone": "(206) 555-0101", "website": "http://a.com"}
+    cache.close()
@@ -0,0 +1,68 @@
+import time
+import pytest
+from mitigator.jobqueue import MemoryJobQueue, SqliteJobQueue
+
+LEASE = 0.05
+
+@pytest.fixture(params=["sqlite", "memory"])
+def make_queue(request, db):
+    queues = []
+    def make(**kw):
+        q = SqliteJobQueue(db, "email", **kw) if request.param == "sqlite" else MemoryJobQueue("email", **kw)
+        queues.append(q)
+        return q
+    yield make
+    for q in queues:
+        q.close()
+
+def test_claim_is_exclusive_while_leased(make_queue):
+    q = make_queue()
+    assert q.enqueue([("1", {"id": 1}), ("2", {"id": 2})]) == 2
+    assert q.claim("w1", 1) == [("1", {"id": 1})]
+    assert q.claim("w2", 5) == [("2", {"id": 2})]
+    assert q.claim("w3", 5) == []
+    assert q.enqueue([("1", {"id": 1})]) == 0  # leased jobs are left alone
+
+def test_expired_lease_is_reclaimed(make_queue):
+    q = make_queue(lease_s=LEASE)
+    q.enqueue([("1", {})])
+    assert q.claim("w1", 1)
+    time.sleep(LEASE * 2)  # w1 hangs past its lease
+    assert q.claim("w2", 1) == [("1", {})]
+    assert q.complete("w1", ["1"]) == 0  # w1 lost the lease; its ack is ignored
+    assert q.complete("w2", ["1"]) == 1
+    assert q.counts() == {"done": 1}
+
+def test_renew_keeps_the_lease(make_queue):
+    q = make_queue(lease_s=LEASE)
+    q.enqueue([("1", {})])
+    q.claim("w1", 1)
+    for _ in range(3):
+        time.sleep(LEASE / 2)
+        assert q.renew("w1", ["1"]) == 1
+    assert q.claim("w2", 1) == []
+
+def test_expired_leases_fail_after_max_attempts(make_queue):
+    q = make_queue(lease_s=LEASE, max_attempts=2)
+    q.enqueue([("1", {})])
+    for w in ("w1", "w2"):
+        assert q.claim(w, 1)
+        time.sleep(LEASE * 2)
+    assert q.claim("w3", 1) == []
+    assert q.counts() == {"failed": 1}
+
+def test_fail_requeues_then_gives_up(make_queue):
+    q = make_queue(max_attempts=2)
+    q.enqueue([("1", {})])
+    q.claim("w1", 1); q.fail("w1", "1", "boom")
+    assert q.counts() == {"queued": 1}
+    q.claim("w1", 1); q.fail("w1", "1", "boom")
+    assert q.counts() == {"failed": 1}
+    assert q.enqueue([("1", {})]) == 1  # finished jobs can be queued again
+
+def test_release_does_not_spend_an_attempt(make_queue):
+    q = make_queue(max_attempts=1)
+    q.enqueue([("1", {})])
+    q.claim("w1", 1)
+    assert q.release("w1", ["1"]) == 1
+    assert q.claim("w2", 1) == [("1", {})]
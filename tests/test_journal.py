@@ -0,0 +1,84 @@
+from mitigator.db import reader, write
+from mitigator.journal import CrawlJournal
+
+A, B, C = ("google", "water damage", "Seattle, WA"), ("yelp", "water damage", "Seattle, WA"), ("google", "mold", "Tacoma, WA")
+
+def store_page(db, journal, unit, page, next_token, n=2):
+    rows = [{"source": unit[0], "source_id": f"{unit[1]}-{page}-{i}"} for i in range(n)]
+    write(db, lambda con: journal.record(con.cursor(), unit, page, rows, next_token))
+
+def test_interrupted_run_resumes_from_saved_token(db):
+    j = CrawlJournal(db)
+    store_page(db, j, A, 0, "tok-1")
+    store_page(db, j, A, 1, "tok-2")
+    store_page(db, j, B, 0, None)
+    j.fail(C, 0, "timeout")
+    run_id = j.run_id
+    j.close()  # the process dies here, without finish()
+
+    j = CrawlJournal(db)
+    assert j.resumed and j.run_id == run_id
+    assert j.pending([A, B, C]) == [(A, "tok-2", 2), (C, None, 0)]
+    assert j.failures() == [("google", "Tacoma, WA", "mold", 0, "timeout", 1)]
+    assert j.rows_saved() == 6
+    j.close()
+
+def test_partially_finished_run_is_not_resumed(db):
+    j = CrawlJournal(db)
+    store_page(db, j, A, 0, None)
+    j.fail(C, 0, "timeout")  # still failing after the retry passes
+    j.finish(complete=False)
+    run_id = j.run_id
+    j = CrawlJournal(db)
+    assert not j.resumed and j.run_id != run_id
+    assert j.pending([A, C]) == [(A, None, 0), (C, None, 0)]
+    assert set(j.last_completed()) == {A}  # C stays due for the planner
+
+def test_finished_run_starts_over(db):
+    j = CrawlJournal(db)
+    store_page(db, j, A, 0, None)
+    j.finish(complete=True)
+    j.close()
+    j = CrawlJournal(db)
+    assert not j.resumed
+    assert j.pending([A]) == [(A, None, 0)]
+    assert A in j.last_completed()
+    j.close()
+
+def test_fresh_ignores_an_unfinished_run(db):
+    j = CrawlJournal(db)
+    store_page(db, j, A, 0, "tok-1")
+    j.close()
+    j = CrawlJournal(db, fresh=True)
+    assert not j.resumed
+    assert j.pending([A]) == [(A, None, 0)]
+    j.close()
+
+def test_completed_query_drops_failures_past_its_last_page(db):
+    j = CrawlJournal(db)
+    j.fail(A, 2, "boom")
+    store_page(db, j, A, 0, None)
+    assert j.failures() == []
+    j.close()
+
+def test_journal_keeps_the_cursor_not_the_rows(db):
+    j = CrawlJournal(db)
+    store_page(db, j, A, 0, "tok-1", n=3)
+    with reader(db) as con:
+        cols = [c[1] for c in con.execute("PRAGMA table_info(crawl_journal)")]
+        assert con.execute("SELECT n_rows, next_token FROM crawl_journal").fetchall() == [(3, "tok-1")]
+    assert "rows" not in cols
+
+def test_finish_prunes_runs_past_the_retention_window(db):
+    j = CrawlJournal(db)
+    store_page(db, j, A, 0, None)
+    j.finish(complete=True)
+    old = j.run_id
+    write(db, lambda con: con.execute("UPDATE crawl_runs SET finished_at = '2000-01-01 00:00:00' WHERE id = ?", (old,)))
+    j = CrawlJournal(db)
+    store_page(db, j, B, 0, None)
+    j.finish(complete=True)
+    with reader(db) as con:
+        assert [r for (r,) in con.execute("SELECT id FROM crawl_runs")] == [j.run_id]
+        assert con.execute("SELECT COUNT(*) FROM crawl_journal WHERE run_id = ?", (old,)).fetchone()[0] == 0
+    assert set(j.last_completed()) == {B}
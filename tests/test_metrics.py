@@ -0,0 +1,19 @@
+import pickle
+from mitigator.metrics import Metrics
+
+def test_merge_adds_a_workers_dump():
+    parent, child = Metrics(), Metrics()
+    parent.inc("rows_total", 2, result="email_updated")
+    parent.observe("http_latency_seconds", 0.2, provider="website")
+    child.inc("rows_total", 3, result="email_updated")
+    child.inc("sites_scanned_total", found=True)
+    child.observe("http_latency_seconds", 3.0, provider="website")
+    child.set("pipeline_queue_depth", 7)
+    parent.merge(pickle.loads(pickle.dumps(child.dump())))  # as it comes back from a pool process
+    snap = parent.snapshot()
+    assert snap["counters"]["rows_total{result=email_updated}"] == 5
+    assert snap["counters"]["sites_scanned_total{found=True}"] == 1
+    assert snap["gauges"]["pipeline_queue_depth"] == 7
+    h = snap["histograms"]["http_latency_seconds{provider=website}"]
+    assert h["count"] == 2 and h["sum"] == 3.2
+    assert h["buckets"]["0.25"] == 1 and h["buckets"]["5.0"] == 2
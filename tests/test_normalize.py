@@ -0,0 +1,25 @@
+import pytest
+from mitigator.normalize import norm_name, norm_phone, root_domain
+
+@pytest.mark.parametrize("raw", ["(206) 555-0101", "206.555.0101", "+1 206-555-0101", "1 (206) 555 0101"])
+def test_norm_phone_drops_the_nanp_country_code(raw):
+    assert norm_phone(raw) == "2065550101"
+
+@pytest.mark.parametrize("raw, want", [
+    ("555-0101", "5550101"),              # too short to carry a country code
+    ("+44 20 7946 0958", "442079460958"),  # 12 digits: left alone
+    ("", None), (None, None), ("ext.", None),
+])
+def test_norm_phone_leaves_other_numbers(raw, want):
+    assert norm_phone(raw) == want
+
+def test_root_domain():
+    assert root_domain("https://www.Example.co.uk/contact") == "example.co.uk"
+    assert root_domain(None) is None
+
+def test_norm_name_drops_common_suffixes():
+    assert norm_name("Alpha Restoration, LLC") == "alpha"
+
+def test_root_domain_of_an_unlisted_tld_keeps_two_labels():
+    assert root_domain("http://shop.mitigator-bench-5.test/contact") == "mitigator-bench-5.test"
+    assert root_domain("http://localhost:8080/") == "localhost"
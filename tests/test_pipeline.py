@@ -0,0 +1,57 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+import pytest
+from mitigator.pipeline import batched, collect
+
+def pages(out, unit, n):
+    for i in range(n):
+        if not out.put(("page", unit, i, [{"i": i}], None)):
+            return
+    out.put(("end", unit, None, None, None))
+
+def run_with_timeout(fn, timeout=10.0):
+    """fn's exception (or None); fails the test if fn is still running after timeout."""
+    result = []
+    def target():
+        try:
+            fn()
+        except Exception as e:
+            result.append(e)
+        else:
+            result.append(None)
+    t = threading.Thread(target=target, daemon=True)
+    t.start(); t.join(timeout)
+    assert not t.is_alive(), "pipeline hung"
+    return result[0]
+
+def test_collect_yields_every_page():
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        events = list(collect(pool, [(u, 20) for u in range(5)], pages, maxsize=2))
+    assert len(events) == 100
+    assert sum(len(b) for b in batched(events, 7)) == 100
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_consumer_error_stops_collectors(workers):
+    started = []
+    def run(out, unit, n):
+        started.append(unit)
+        pages(out, unit, n)
+    def crawl():
+        # more jobs than workers, and each would block on the tiny queue forever
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            with closing(collect(pool, [(u, 10_000) for u in range(20)], run, maxsize=1)) as events:
+                for n, _ in enumerate(events):
+                    if n == 5:
+                        raise RuntimeError("store failed")
+    err = run_with_timeout(crawl)
+    assert isinstance(err, RuntimeError)
+    assert len(started) < 20  # queued jobs were cancelled, not run
+
+def test_consumer_break_stops_collectors():
+    def crawl():
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            with closing(collect(pool, [(u, 10_000) for u in range(4)], pages, maxsize=1)) as events:
+                for _ in events:
+                    break
+    assert run_with_timeout(crawl) is None
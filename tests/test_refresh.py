@@ -0,0 +1,17 @@
+import time
+from mitigator.collect.details_cache import DetailsCache
+from mitigator.refresh import due_details
+from mitigator.store import upsert_companies
+
+def google_row(sid, phone=None, website=None, last_seen="2000-01-01"):
+    return {"source": "google", "source_id": sid, "name": f"Co {sid}", "phone": phone, "website": website,
+            "address": "1 Main St, Seattle, WA 98101", "last_seen": last_seen}
+
+def test_due_details_reads_a_separate_cache_db(db, tmp_path):
+    upsert_companies(db, [google_row("P1", "2065550101"), google_row("P2", "2065550102"),
+                          google_row("P3", "2065550103", "gamma.com", last_seen=time.strftime("%Y-%m-%d"))])
+    cache = DetailsCache(str(tmp_path / "cache.db"))  # no companies table, and none of the main DB's
+    cache.put("P1", {"phone": "2065550101", "website": None})
+    # P1 fetched just now, P3 complete and seen today (never cached); P2 is due
+    assert [p for _, p in due_details(db, cache)] == ["P2"]
+    cache.close()
@@ -0,0 +1,48 @@
+from mitigator import cli
+from mitigator.db import reader, write
+from mitigator.shard import _version, merge_shards, parse_shard, shard_units
+from mitigator.store import db_init, upsert_companies
+
+def test_shards_partition_the_queries():
+    units = [(p, kw, area) for area in ("Seattle, WA", "Tacoma, WA", "Everett, WA")
+             for kw in ("water damage", "mold", "fire damage") for p in ("google", "yelp")]
+    shards = [shard_units(units, i, 4) for i in range(4)]
+    assert sorted(u for s in shards for u in s) == sorted(units)
+    for s in shards:  # both providers of a pair land together
+        assert {(kw, a) for p, kw, a in s if p == "google"} == {(kw, a) for p, kw, a in s if p == "yelp"}
+
+def test_parse_shard():
+    assert parse_shard("2/8") == (2, 8)
+
+def test_shard_processes_split_the_provider_qps(monkeypatch):
+    monkeypatch.setattr(cli, "PROVIDER_LIMITS", {"google": (10.0, 4), "yelp": (0.0, 2)})
+    env = cli.shard_env(4)
+    assert float(env["GOOGLE_QPS"]) == 2.5
+    assert float(env["YELP_QPS"]) == 0.0  # unpaced stays unpaced
+
+def test_merge_skips_columns_the_main_db_lacks(db, tmp_path):
+    shard = str(tmp_path / "mitigation.shard0of1.db")
+    db_init(shard)
+    upsert_companies(shard, [{"source": "google", "source_id": "a", "name": "Alpha Dry", "phone": "2065550101",
+                              "address": "1 Main St, Seattle, WA 98101", "last_seen": "2026-01-01"}])
+    write(shard, lambda con: con.execute("ALTER TABLE companies ADD COLUMN legacy_note TEXT"))  # another version's shard
+    assert merge_shards(db, [shard])["inserted"] == 1
+    with reader(db) as con:
+        assert con.execute("SELECT name FROM companies").fetchall() == [("Alpha Dry",)]
+
+def make_shard(path, sid, name, phone):
+    db_init(path)
+    upsert_companies(path, [{"source": "google", "source_id": sid, "name": name, "phone": phone,
+                             "address": "1 Main St, Seattle, WA 98101", "last_seen": "2026-01-01"}])
+
+def test_recreated_shard_is_not_taken_for_unchanged(db, tmp_path):
+    shard = str(tmp_path / "mitigation.shard0of1.db")
+    make_shard(shard, "a", "Alpha Dry", "2065550101")
+    assert merge_shards(db, [shard])["shards"] == 1
+    assert merge_shards(db, [shard])["skipped_shards"] == 1  # unchanged
+    before = _version(shard)
+    for f in tmp_path.glob("mitigation.shard0of1.db*"):
+        f.unlink()
+    make_shard(shard, "b", "Bravo Restoration", "2065550202")  # same data_version, different file
+    assert _version(shard) != before
+    assert merge_shards(db, [shard])["inserted"] == 1
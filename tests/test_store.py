@@ -0,0 +1,113 @@
+from mitigator.db import reader, write
+from mitigator.query import fetch_page
+from mitigator.store import db_init, merge_companies, rebuild_entity_index, update_contacts, upsert_companies
+
+def row(sid, name, phone=None, website=None, **kw):
+    return {"source": "google", "source_id": sid, "name": name, "phone": phone, "website": website,
+            "address": "1 Main St, Seattle, WA 98101", "last_seen": "2026-01-01", **kw}
+
+def companies(db):
+    with reader(db) as con:
+        return con.execute("SELECT id, name, phone, website FROM companies ORDER BY id").fetchall()
+
+def key_owners(db):
+    with reader(db) as con:
+        return dict(con.execute("SELECT key, company_id FROM entity_keys"))
+
+def test_shared_key_merges_into_existing_row(db):
+    upsert_companies(db, [row("a", "Alpha Dry", phone="206-555-0101")])
+    stats = upsert_companies(db, [row("b", "Alpha Drying", phone="(206) 555-0101", website="alphadry.com")])
+    assert stats["merged"] == 1 and stats["inserted"] == 0
+    assert companies(db) == [(1, "Alpha Dry", "206-555-0101", "alphadry.com")]
+    assert set(key_owners(db).values()) == {1}
+
+def test_keys_link_rows_within_one_batch(db):
+    # a-b share a phone, b-c share a domain: one company, even though a and c share nothing
+    stats = upsert_companies(db, [row("a", "Alpha", phone="2065550101"),
+                                  row("b", "Bravo", phone="2065550101", website="https://bravo.com"),
+                                  row("c", "Charlie", website="bravo.com/contact")])
+    assert stats["inserted"] == 1
+    assert len(companies(db)) == 1
+
+def test_bridging_row_collapses_clusters_into_oldest(db):
+    upsert_companies(db, [row("a", "Alpha", phone="2065550101")])
+    upsert_companies(db, [row("b", "Bravo", website="bravo.com")])
+    assert len(companies(db)) == 2
+    stats = upsert_companies(db, [row("c", "Charlie", phone="2065550101", website="bravo.com")])
+    assert stats["collapsed"] == 1
+    assert companies(db) == [(1, "Alpha", "2065550101", "bravo.com")]
+    owners = key_owners(db)
+    assert owners["ph:2065550101"] == owners["ws:bravo.com"] == 1
+    assert set(owners.values()) == {1}
+
+def test_unrelated_rows_stay_apart(db):
+    upsert_companies(db, [row("a", "Alpha", phone="2065550101"), row("b", "Bravo", phone="2065550202")])
+    assert len(companies(db)) == 2
+
+def test_merge_companies_repoints_keys_and_stats(db):
+    upsert_companies(db, [row("a", "Alpha", phone="2065550101", score=1.0),
+                          row("b", "Bravo", phone="2065550202", score=2.0, email="x@bravo.com")])
+    assert merge_companies(db, [[2, 1]]) == 1
+    assert [c[0] for c in companies(db)] == [1]
+    assert set(key_owners(db).values()) == {1}
+    with reader(db) as con:
+        stats = con.execute("SELECT SUM(companies), SUM(has_email) FROM company_stats WHERE companies > 0").fetchone()
+    assert stats == (1, 1)
+
+def test_category_filter_reads_the_normalized_list(db):
+    upsert_companies(db, [row("a", "Alpha", phone="2065550101", categories="water_damage,Mold_Remediation"),
+                          row("b", "Bravo", phone="2065550202", categories="Fire Damage")])
+    with reader(db) as con:
+        assert con.execute("SELECT category_list FROM companies WHERE id = 1").fetchone() == ("mold remediation,water damage",)
+    assert fetch_page(db, {"categories": ["water damage", "mold"]}, columns=("name",)) == [("Alpha",)]
+
+def test_db_init_reindexes_an_fts_table_over_raw_categories(db):
+    upsert_companies(db, [row("a", "Alpha", phone="2065550101", categories="mold_remediation")])
+    old = ["DROP TRIGGER companies_fts_ai", "DROP TRIGGER companies_fts_ad", "DROP TRIGGER companies_fts_au",
+           "DROP TABLE companies_fts",
+           "CREATE VIRTUAL TABLE companies_fts USING fts5(name, address, website, categories, content='companies', content_rowid='id')"]
+    write(db, lambda con: [con.execute(sql) for sql in old])
+    db_init(db)
+    assert fetch_page(db, {"categories": ["remediation"]}, columns=("name",)) == [("Alpha",)]
+
+def test_rebuild_entity_index_merges_rows_sharing_a_key(db):
+    upsert_companies(db, [row("a", "Alpha", phone="2065550101"), row("b", "Bravo", phone="2065550202")])
+    write(db, lambda con: con.execute("UPDATE companies SET phone = '2065550101' WHERE id = 2"))
+    assert rebuild_entity_index(db) == 1
+    assert [c[0] for c in companies(db)] == [1]
+
+def test_country_code_does_not_split_a_company(db):
+    upsert_companies(db, [row("a", "Alpha", phone="(206) 555-0101")])
+    stats = upsert_companies(db, [row("b", "Alpha Dry", phone="+1 206-555-0101")])
+    assert stats["merged"] == 1 and len(companies(db)) == 1
+
+def test_db_init_rekeys_an_old_key_format(db):
+    upsert_companies(db, [row("a", "Alpha", phone="2065550101")])
+    # as written before phones dropped the country code
+    write(db, lambda con: (con.execute("UPDATE entity_keys SET key = 'ph:12065550101' WHERE key = 'ph:2065550101'"),
+                           con.execute("DELETE FROM meta WHERE key = 'key_format'")))
+    db_init(db)
+    assert key_owners(db)["ph:2065550101"] == 1
+    assert "ph:12065550101" not in key_owners(db)
+
+def test_update_contacts_rekeys_the_company(db):
+    upsert_companies(db, [row("a", "Alpha", phone="2065550101")])
+    assert update_contacts(db, [("2065550199", "alpha.com", 1)]) == {"updated": 1, "collapsed": 0}
+    assert key_owners(db) == {"ph:2065550199": 1, "ws:alpha.com": 1, "nm:alpha|seattle|WA": 1}
+    # the new phone now finds the company; the old one no longer does
+    assert upsert_companies(db, [row("b", "Alpha Dry", phone="206-555-0199")])["merged"] == 1
+    assert upsert_companies(db, [row("c", "Other", phone="206-555-0101")])["inserted"] == 1
+
+def test_key_held_only_in_the_entity_key_column_merges(db):
+    upsert_companies(db, [row("a", "Alpha", phone="2065550101")])
+    write(db, lambda con: con.execute("DELETE FROM entity_keys WHERE key = 'ph:2065550101'"))  # unindexed, column only
+    stats = upsert_companies(db, [row("b", "Alpha Dry", phone="206-555-0101", website="alphadry.com")])
+    assert stats["merged"] == 1 and stats["skipped"] == 0
+    assert companies(db) == [(1, "Alpha", "2065550101", "alphadry.com")]  # the row is not dropped
+    assert key_owners(db)["ph:2065550101"] == 1
+
+def test_update_contacts_merges_a_company_sharing_the_new_key(db):
+    upsert_companies(db, [row("a", "Alpha", phone="2065550101"), row("b", "Bravo", website="bravo.com")])
+    assert update_contacts(db, [(None, "https://bravo.com", 2), ("2065550101", None, 2)]) == {"updated": 2, "collapsed": 1}
+    assert [c[0] for c in companies(db)] == [1]
+    assert set(key_owners(db).values()) == {1}